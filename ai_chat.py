@@ -1,64 +1,244 @@
+import asyncio
 import os
 import logging
+import re
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
-import tiktoken
+from config import Config
+from modules.intents import IntentClassifier
+from modules.llm_cache import ResponseCache
+from modules.token_index import TokenizedText, get_encoding
+from modules.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Resume and job description headings: "EXPERIENCE", "Work history:" etc.
+SECTION_HEADING = re.compile(r'^[ \t]*(?:[A-Z][A-Z0-9 &/,-]{2,50}|[A-Z][\w &/,-]{0,50}:)[ \t]*$', re.MULTILINE)
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+MAX_REDUCE_ROUNDS = 3
+SYSTEM_PROMPT = "You are Chief, a helpful AI assistant for job applications and resume analysis."
+
+
+def split_sections(text):
+    starts = [0] + [match.start() for match in SECTION_HEADING.finditer(text) if match.start() > 0]
+    sections = [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+    return [section for section in sections if section.strip()]
+
 
 class AIChatBot:
-    def __init__(self):
+    def __init__(self, cache=None, intents=None):
         self.api_key = os.environ.get("OPENAI_API_KEY")
         if not self.api_key:
-            logging.error("OpenAI API key not found in environment variables")
+            logger.error("OpenAI API key not found in environment variables")
             raise ValueError("OpenAI API key is missing. Please set the OPENAI_API_KEY environment variable.")
         self.chat_model = ChatOpenAI(temperature=0.7, openai_api_key=self.api_key)
         self.max_tokens = 16000  # Set a limit slightly below the model's maximum
-        self.encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        self.encoding = get_encoding()
+        self.cache = cache or ResponseCache()
+        self.intents = intents or IntentClassifier()
 
     def truncate_text(self, text, max_tokens):
-        tokens = self.encoding.encode(text)
-        if len(tokens) <= max_tokens:
-            return text
-        return self.encoding.decode(tokens[:max_tokens])
+        if isinstance(text, TokenizedText):
+            with tracer.span('tokenize.truncate_indexed'):
+                return text.truncate(max_tokens)
+        with tracer.span('tokenize.truncate'):
+            tokens = self.encoding.encode(text)
+            tracer.count('tokenize.truncate_tokens', len(tokens))
+            if len(tokens) <= max_tokens:
+                return text
+            return self.encoding.decode(tokens[:max_tokens])
+
+    def record_usage(self, response):
+        # Token counts come from the API's usage report where there is one
+        usage = getattr(response, 'usage_metadata', None) or {}
+        tracer.count('llm.prompt_tokens', usage.get('input_tokens', 0))
+        tracer.count('llm.completion_tokens', usage.get('output_tokens', 0))
+        tracer.count('llm.response_bytes', len(response.content.encode('utf-8')))
+
+    def count_tokens(self, text):
+        if isinstance(text, TokenizedText):
+            return text.token_count
+        return len(self.encoding.encode(text))
+
+    def split_into_chunks(self, text, chunk_tokens):
+        # Paragraphs are packed into chunks of at most chunk_tokens, but a chunk
+        # never crosses a section heading: editing one section leaves the other
+        # sections' chunks, and their cached summaries, unchanged.
+        chunks = []
+        for section in split_sections(text):
+            current, current_tokens = [], 0
+            for paragraph in PARAGRAPH_BREAK.split(section):
+                tokens = self.encoding.encode(paragraph)
+                if current and current_tokens + len(tokens) > chunk_tokens:
+                    chunks.append("\n\n".join(current))
+                    current, current_tokens = [], 0
+                if len(tokens) > chunk_tokens:
+                    chunks.extend(self.encoding.decode(tokens[start:start + chunk_tokens])
+                                  for start in range(0, len(tokens), chunk_tokens))
+                    continue
+                current.append(paragraph)
+                current_tokens += len(tokens)
+            if current:
+                chunks.append("\n\n".join(current))
+        return chunks
+
+    def summarize_chunks(self, chunks, kind):
+        # Map step: every chunk not already in the cache is summarised, in
+        # parallel, in one batch call.
+        messages = [[
+            SystemMessage(content=SYSTEM_PROMPT),
+            HumanMessage(content=f"Summarize this part of a {kind}. Keep every skill, technology, employer, job title, date, qualification and requirement; drop filler.\n\n{chunk}")
+        ] for chunk in chunks]
+        keys = [ResponseCache.make_key(self.chat_model.model_name, self.chat_model.temperature, chunk_messages)
+                for chunk_messages in messages]
+        summaries = [self.cache.get(key) for key in keys]
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        if missing:
+            logger.info(f"Summarizing {len(missing)} of {len(chunks)} {kind} chunks")
+            with tracer.span('llm.batch'):
+                responses = self.chat_model.batch([messages[index] for index in missing],
+                                                  config={'max_concurrency': Config.CHUNK_CONCURRENCY})
+            tracer.count('llm.calls', len(responses))
+            for index, response in zip(missing, responses):
+                self.record_usage(response)
+                summaries[index] = response.content.strip()
+                self.cache.put(keys[index], self.chat_model.model_name, summaries[index])
+        return summaries
+
+    def condense(self, text, max_tokens, kind):
+        # Reduce step: a document over its token budget is replaced by the
+        # summaries of its chunks, summarised again until they fit, instead of
+        # being cut off at the budget.
+        for _ in range(MAX_REDUCE_ROUNDS):
+            if self.count_tokens(text) <= max_tokens:
+                return text
+            chunks = self.split_into_chunks(text, min(Config.CHUNK_TOKENS, max_tokens))
+            text = "\n\n".join(self.summarize_chunks(chunks, kind))
+        return self.truncate_text(text, max_tokens)
+
+    def build_messages(self, text):
+        truncated_text = self.truncate_text(text, self.max_tokens)
+        return [
+            SystemMessage(content=SYSTEM_PROMPT),
+            HumanMessage(content=truncated_text)
+        ]
 
-    def chatbot_response(self, text):
+    def stream_messages(self, messages):
+        tracer.count('llm.calls')
+        with tracer.span('llm.stream'):
+            for chunk in self.chat_model.stream(messages):
+                self.record_usage(chunk)
+                if chunk.content:
+                    yield chunk.content
+
+    def complete(self, messages, on_token=None, use_cache=True):
+        # With on_token set the reply is streamed, and each piece is passed to the
+        # callback as it arrives; the full text is still returned at the end.
+        if use_cache:
+            key = ResponseCache.make_key(self.chat_model.model_name, self.chat_model.temperature, messages)
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info("Serving response from the LLM cache")
+                tracer.count('llm.cache_hits')
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+
+        if on_token is None:
+            tracer.count('llm.calls')
+            with tracer.span('llm.invoke'):
+                message = self.chat_model.invoke(messages)
+            self.record_usage(message)
+            response = message.content.strip()
+        else:
+            parts = []
+            for token in self.stream_messages(messages):
+                parts.append(token)
+                on_token(token)
+            response = "".join(parts).strip()
+
+        if use_cache:
+            self.cache.put(key, self.chat_model.model_name, response)
+        return response
+
+    async def acomplete(self, messages, use_cache=True):
+        # Non-streaming async variant of complete() for batch runs; errors
+        # propagate so the caller can retry them.
+        if use_cache:
+            key = ResponseCache.make_key(self.chat_model.model_name, self.chat_model.temperature, messages)
+            cached = self.cache.get(key)
+            if cached is not None:
+                tracer.count('llm.cache_hits')
+                return cached
+        tracer.count('llm.calls')
+        with tracer.span('llm.ainvoke'):
+            message = await self.chat_model.ainvoke(messages)
+        self.record_usage(message)
+        response = message.content.strip()
+        if use_cache:
+            self.cache.put(key, self.chat_model.model_name, response)
+        return response
+
+    def quick_reply(self, text, on_token=None):
+        # A canned answer for greetings, thanks and the like, or None when the
+        # message needs the LLM
+        reply = self.intents.respond(text)
+        if reply is not None:
+            logger.info(f"Answered locally; intent hit rate {self.intents.stats()['hit_rate']:.0%}")
+            if on_token is not None:
+                on_token(reply)
+        return reply
+
+    def chatbot_response(self, text, on_token=None):
+        reply = self.quick_reply(text, on_token)
+        if reply is not None:
+            return reply
+        return self.llm_response(text, on_token)
+
+    def llm_response(self, text, on_token=None, use_cache=False):
+        # Free-form chat is not cached by default; the analysis helpers below
+        # only depend on their inputs and opt in. They never go through
+        # quick_reply, so their prompts do not count as intent lookups.
         try:
-            truncated_text = self.truncate_text(text, self.max_tokens)
-            messages = [
-                SystemMessage(content="You are Chief, a helpful AI assistant for job applications and resume analysis."),
-                HumanMessage(content=truncated_text)
-            ]
-            response = self.chat_model.invoke(messages)
-            return response.content.strip()
+            return self.complete(self.build_messages(text), on_token, use_cache)
         except Exception as e:
-            logging.error(f"Error in chatbot_response: {str(e)}")
+            logger.error(f"Error in llm_response: {str(e)}")
             return "I apologize, but I encountered an error while processing your message. Please try again later or contact support if the issue persists."
 
-    def analyze_resume(self, resume_content):
-        truncated_content = self.truncate_text(resume_content, self.max_tokens // 2)
+    def analyze_resume(self, resume_content, on_token=None):
+        truncated_content = self.condense(resume_content, self.max_tokens // 2, "resume")
         prompt = f"Analyze the following resume and provide a summary of key skills, experience, and areas for improvement:\n\n{truncated_content}"
-        return self.chatbot_response(prompt)
+        return self.llm_response(prompt, on_token, use_cache=True)
 
-    def analyze_application(self, application_content):
-        truncated_content = self.truncate_text(application_content, self.max_tokens // 2)
+    def analyze_application(self, application_content, on_token=None):
+        truncated_content = self.condense(application_content, self.max_tokens // 2, "job description")
         prompt = f"Analyze the following job application and provide a summary of key requirements and responsibilities:\n\n{truncated_content}"
-        return self.chatbot_response(prompt)
+        return self.llm_response(prompt, on_token, use_cache=True)
+
+    def comparison_prompt(self, resume_content, application_content):
+        truncated_resume = self.condense(resume_content, self.max_tokens // 3, "resume")
+        truncated_application = self.condense(application_content, self.max_tokens // 3, "job description")
+        return f"Compare the following resume and job application. Identify matches, mismatches, and provide recommendations:\n\nResume:\n{truncated_resume}\n\nJob Application:\n{truncated_application}"
+
+    def compare_resume_application(self, resume_content, application_content, on_token=None):
+        prompt = self.comparison_prompt(resume_content, application_content)
+        return self.llm_response(prompt, on_token, use_cache=True)
 
-    def compare_resume_application(self, resume_content, application_content):
-        truncated_resume = self.truncate_text(resume_content, self.max_tokens // 3)
-        truncated_application = self.truncate_text(application_content, self.max_tokens // 3)
-        prompt = f"Compare the following resume and job application. Identify matches, mismatches, and provide recommendations:\n\nResume:\n{truncated_resume}\n\nJob Application:\n{truncated_application}"
-        return self.chatbot_response(prompt)
+    async def acompare_resume_application(self, resume_content, application_content):
+        # Condensing long documents makes blocking LLM calls of its own
+        prompt = await asyncio.to_thread(self.comparison_prompt, resume_content, application_content)
+        return await self.acomplete(self.build_messages(prompt))
 
-    def generate_cover_letter(self, resume_content, application_content):
+    def generate_cover_letter(self, resume_content, application_content, on_token=None):
         try:
-            truncated_resume = self.truncate_text(resume_content, self.max_tokens // 3)
-            truncated_application = self.truncate_text(application_content, self.max_tokens // 3)
+            truncated_resume = self.condense(resume_content, self.max_tokens // 3, "resume")
+            truncated_application = self.condense(application_content, self.max_tokens // 3, "job description")
             messages = [
                 SystemMessage(content="You are Chief, an AI assistant specialized in generating cover letters based on resumes and job applications."),
                 HumanMessage(content=f"Generate a cover letter based on this resume:\n\n{truncated_resume}\n\nAnd this job application:\n\n{truncated_application}")
             ]
-            response = self.chat_model.invoke(messages)
-            return f"Here's the generated cover letter:\n\n{response.content.strip()}"
+            cover_letter = self.complete(messages, on_token)
+            return f"Here's the generated cover letter:\n\n{cover_letter}"
         except Exception as e:
-            logging.error(f"Error in generate_cover_letter: {str(e)}")
+            logger.error(f"Error in generate_cover_letter: {str(e)}")
             return "I apologize, but I encountered an error while generating the cover letter. Please try again later or contact support if the issue persists."
@@ -1,55 +1,111 @@
-import speech_recognition as sr
-import pyttsx3
 import logging
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QLineEdit, QPushButton
+from config import Config
+from modules.batch_analysis import format_results, run_batch
+from modules.conversation import Conversation
+from modules.matching import MatchIndex
+from modules.resume_parser import get_or_extract_resume_text
+from tts_worker import SpeechQueue
+from voice_input import VoiceInput
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit, QPushButton,
+                             QProgressBar, QLabel)
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingMessage:
+    # Renders a streamed reply into its own paragraph of the chat history. The
+    # insertion point is derived from a cursor anchored at the paragraph start,
+    # so replies streaming concurrently, or messages appended below, never mix.
+    def __init__(self, text_edit, prefix):
+        self.text_edit = text_edit
+        text_edit.append(prefix)
+        end = QTextCursor(text_edit.document())
+        end.movePosition(QTextCursor.End)
+        self.start = QTextCursor(end)
+        self.start.movePosition(QTextCursor.StartOfBlock)
+        self.length = end.position() - self.start.position()
+
+    def add_text(self, text):
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.setPosition(self.start.position() + self.length)
+        cursor.insertText(text)
+        self.length = cursor.position() - self.start.position()
+        scroll_bar = self.text_edit.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
 
 class AIChatTab(QWidget):
-    def __init__(self, chatbot, db):
+    def __init__(self, chatbot, db, executor, user_id=None):
         super().__init__()
         self.chatbot = chatbot
         self.db = db
+        self.executor = executor
         self.current_resume = None
+        self.current_resume_id = None
         self.current_application = None
-        self.recognizer = sr.Recognizer()
-        self.engine = pyttsx3.init()
+        self.user_id = user_id
+        self.conversation = None
+        self.match_index = None
+        self.tts = SpeechQueue(parent=self)
+        self.voice_input = VoiceInput(parent=self)
         self.init_ui()
+        self.tts.error.connect(lambda message: self.chat_history.append(f"Chief: Error in text-to-speech: {message}"))
+        # Stops speaking and ends the speech thread instead of leaving it to die with the process
+        QApplication.instance().aboutToQuit.connect(self.tts.shutdown)
+        self.voice_input.text_recognized.connect(self.send_message)
+        self.voice_input.listening_changed.connect(self.update_voice_button)
+        self.voice_input.error.connect(lambda message: self.chat_history.append(f"Chief: {message}"))
 
     def set_current_resume(self, user_id, filename):
-        try:
-            resume = self.db.get_resume_by_filename(user_id, filename)
-            if resume:
-                # Try different encodings
-                encodings = ['utf-8', 'iso-8859-1', 'windows-1252']
-                for encoding in encodings:
-                    try:
-                        self.current_resume = resume[3].decode(encoding) if isinstance(resume[3], bytes) else resume[3]
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                else:
-                    raise ValueError(
-                        f"Unable to decode resume content with any of the attempted encodings: {encodings}")
-
-                self.chat_history.append("Chief: Resume loaded for analysis.")
-                self.analyze_resume()
-            else:
-                raise ValueError("Resume not found.")
-        except Exception as e:
-            logging.error(f"Error setting current resume: {str(e)}", exc_info=True)
-            self.chat_history.append(f"Chief: Error loading resume: {str(e)}")
+        # Loaded in a job: a resume whose text was never extracted is parsed here
+        def on_result(resume_text):
+            if not resume_text:
+                self.chat_history.append("Chief: Error loading resume: Resume not found.")
+                return
+            self.user_id = user_id
+            self.current_resume_id = resume_text[0]
+            self.current_resume = resume_text[1]
+            self.get_conversation().pin("resume", self.current_resume)
+            self.chat_history.append(f"Chief: Resume loaded for analysis. {self.describe_length(resume_text[1])}")
+            self.analyze_resume()
 
-    def set_current_application(self, user_id, company, position):
-        try:
-            application = self.db.get_application_by_company_position(user_id, company, position)
-            if application:
-                self.current_application = application[4]  # Assuming job description is at index 4
-                self.chat_history.append("Chief: Job application loaded for analysis.")
-                self.analyze_application()
-            else:
-                raise ValueError("Application not found.")
-        except Exception as e:
-            logging.error(f"Error setting current application: {str(e)}", exc_info=True)
-            self.chat_history.append(f"Chief: Error loading application: {str(e)}")
+        def on_error(message):
+            self.chat_history.append(f"Chief: Error loading resume: {message}")
+
+        self.executor.submit(lambda job: get_or_extract_resume_text(self.db, user_id, filename),
+                             description="Loading resume", trace_name="job.load_resume", on_result=on_result,
+                             on_error=on_error, interactive=True)
+
+    def set_current_application(self, user_id, application_id):
+        # Loaded in a job: the job description is tokenized here if the
+        # background indexing has not reached it yet
+        def on_result(job_description):
+            if job_description is None:
+                self.chat_history.append("Chief: Error loading application: Application not found.")
+                return
+            self.user_id = user_id
+            self.current_application = job_description
+            self.get_conversation().pin("job description", self.current_application)
+            self.chat_history.append(
+                f"Chief: Job application loaded for analysis. {self.describe_length(self.current_application)}")
+            self.analyze_application()
+
+        def on_error(message):
+            self.chat_history.append(f"Chief: Error loading application: {message}")
+
+        self.executor.submit(lambda job: self.db.get_job_description(user_id, application_id),
+                             description="Loading application", on_result=on_result, on_error=on_error,
+                             interactive=True)
+
+    def describe_length(self, text):
+        # How much of a document fits in a comparison prompt, where it shares
+        # the context window with the other document
+        token_count = self.chatbot.count_tokens(text)
+        budget = self.chatbot.max_tokens // 3
+        if token_count <= budget:
+            return f"({token_count:,} tokens, fits in full)"
+        return f"({token_count:,} tokens; over the {budget:,}-token budget, so it will be summarized first)"
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -59,13 +115,21 @@ class AIChatTab(QWidget):
         layout.addWidget(self.chat_history)
 
         self.input_field = QLineEdit()
-        self.input_field.returnPressed.connect(self.send_message)
+        self.input_field.returnPressed.connect(lambda: self.send_message())
         layout.addWidget(self.input_field)
 
         send_button = QPushButton("Send")
-        send_button.clicked.connect(self.send_message)
+        send_button.clicked.connect(lambda: self.send_message())
         layout.addWidget(send_button)
 
+        self.voice_button = QPushButton("Start Voice Input")
+        self.voice_button.clicked.connect(self.toggle_voice_input)
+        layout.addWidget(self.voice_button)
+
+        new_conversation_button = QPushButton("New Conversation")
+        new_conversation_button.clicked.connect(self.new_conversation)
+        layout.addWidget(new_conversation_button)
+
         analyze_resume_button = QPushButton("Analyze Resume")
         analyze_resume_button.clicked.connect(self.analyze_resume)
         layout.addWidget(analyze_resume_button)
@@ -78,83 +142,231 @@ class AIChatTab(QWidget):
         compare_button.clicked.connect(self.compare_resume_application)
         layout.addWidget(compare_button)
 
+        rank_button = QPushButton("Rank Applications for Resume")
+        rank_button.clicked.connect(self.rank_applications)
+        layout.addWidget(rank_button)
+
+        batch_button = QPushButton("Compare Resume with All Applications")
+        batch_button.clicked.connect(self.analyze_all_applications)
+        layout.addWidget(batch_button)
+
+        batch_results_button = QPushButton("Show Batch Results")
+        batch_results_button.clicked.connect(self.show_batch_results)
+        layout.addWidget(batch_results_button)
+
+        progress_layout = QHBoxLayout()
+        self.progress_label = QLabel()
+        progress_layout.addWidget(self.progress_label)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)  # Busy indicator; LLM calls report no intermediate progress
+        progress_layout.addWidget(self.progress_bar)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_requests)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+        self.executor.active_jobs_changed.connect(self.update_progress)
+        self.update_progress([])
+
         self.setLayout(layout)
+        if self.user_id is not None:
+            self.show_recent_turns()
 
-    def send_message(self):
-        user_message = self.input_field.text()
-        self.input_field.clear()
-        self.chat_history.append(f"You: {user_message}")
+    def update_progress(self, descriptions):
+        busy = bool(descriptions)
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+        if busy:
+            self.progress_label.setText(f"Chief is working on: {', '.join(descriptions)}")
+        else:
+            self.progress_label.clear()
 
-        try:
-            chief_response = self.chatbot.chatbot_response(user_message)
+    def cancel_requests(self):
+        self.executor.cancel_all()
+
+    def run_chat_job(self, description, fn, *args, speak=False, interactive=False):
+        # Replies are streamed into the chat history token by token; the final
+        # text is only used for logging and speech.
+        stream = None
+        # Spoken replies start playing with their first complete sentence
+        speech = self.tts.stream() if speak else None
+
+        def on_token(text):
+            nonlocal stream
+            if stream is None:
+                stream = StreamingMessage(self.chat_history, "Chief: ")
+            stream.add_text(text)
+            if speech is not None:
+                speech.add_text(text)
+
+        def on_result(response):
             # Remove "Chief:" if it's at the beginning of the response
-            if chief_response.startswith("Chief:"):
-                chief_response = chief_response[6:].strip()
-            self.chat_history.append(f"Chief: {chief_response}")
-            self.speak_text(chief_response)
-        except Exception as e:
-            error_message = f"An error occurred: {str(e)}"
-            self.chat_history.append(f"Chief: {error_message}")
-            logging.error(f"Error in chatbot response: {str(e)}")
-
-    def recognize_speech(self):
-        with sr.Microphone() as source:
-            self.chat_history.append("Listening...")
-            try:
-                audio = self.recognizer.listen(source)
-                user_message = self.recognizer.recognize_google(audio)
-                self.chat_history.append(f"You: {user_message}")
-                self.send_message(user_message)
-            except sr.UnknownValueError:
-                self.chat_history.append("Chief: Sorry, I could not understand your speech.")
-                self.speak_text("Sorry, I could not understand your speech.")
-            except sr.RequestError as e:
-                self.chat_history.append(f"Chief: Could not request results from the speech recognition service: {str(e)}")
-                self.speak_text(f"Could not request results from the speech recognition service: {str(e)}")
-            except Exception as e:
-                self.chat_history.append(f"Chief: An error occurred while recognizing speech: {str(e)}")
-                logging.error(f"Error in speech recognition: {str(e)}")
+            if response.startswith("Chief:"):
+                response = response[6:].strip()
+            if stream is None:
+                self.chat_history.append(f"Chief: {response}")
+                if speech is not None:
+                    speech.add_text(response)
+            logger.info(f"{description} completed ({len(response)} characters)")
+            if speech is not None:
+                speech.finish()
+
+        def on_error(message):
+            self.chat_history.append(f"Chief: An error occurred: {message}")
+
+        def on_cancelled():
+            self.chat_history.append(f"Chief: {description} cancelled.")
+
+        return self.executor.submit(lambda job: fn(*args, on_token=job.emit_token), description=description,
+                                    on_result=on_result, on_error=on_error, on_cancelled=on_cancelled,
+                                    on_token=on_token, trace_name=f"job.{fn.__name__}", interactive=interactive)
+
+    def get_conversation(self):
+        if self.conversation is None or self.conversation.user_id != self.user_id:
+            self.conversation = Conversation(self.db, self.chatbot, self.user_id)
+        return self.conversation
+
+    def show_recent_turns(self):
+        # Picks up where the user's last session left off
+        for _, role, content, _ in self.get_conversation().recent_turns():
+            self.chat_history.append(f"{'You' if role == 'user' else 'Chief'}: {content}")
+
+    def new_conversation(self):
+        self.get_conversation().new_session()
+        self.chat_history.clear()
+        self.chat_history.append("Chief: Started a new conversation.")
+
+    def send_message(self, text=None):
+        # text comes from voice input; otherwise the typed message is sent
+        if text is None:
+            text = self.input_field.text()
+            self.input_field.clear()
+        if not text.strip():
+            return
+        self.chat_history.append(f"You: {text}")
+        self.tts.interrupt()  # Stop reading out the previous answer
+        self.run_chat_job("Chat reply", self.get_conversation().reply, text, speak=True, interactive=True)
+
+    def toggle_voice_input(self):
+        if self.voice_input.is_listening():
+            self.voice_input.stop()
+        else:
+            self.voice_input.start()
+
+    def update_voice_button(self, listening):
+        self.voice_button.setText("Stop Voice Input" if listening else "Start Voice Input")
+        self.chat_history.append("Chief: Listening..." if listening else "Chief: Voice input stopped.")
 
     def speak_text(self, text):
-        try:
-            self.engine.say(text)
-            self.engine.runAndWait()
-        except Exception as e:
-            logging.error(f"Error in text-to-speech: {str(e)}")
-            self.chat_history.append(f"Chief: Error in text-to-speech: {str(e)}")
+        self.tts.speak(text)
 
     def analyze_resume(self):
         if self.current_resume:
-            analysis = self.chatbot.analyze_resume(self.current_resume)
-            self.chat_history.append(f"Chief: {analysis}")
+            self.run_chat_job("Resume analysis", self.chatbot.analyze_resume, self.current_resume)
         else:
             self.chat_history.append("Chief: No resume loaded. Please select a resume first.")
 
     def analyze_application(self):
         if self.current_application:
-            analysis = self.chatbot.analyze_application(self.current_application)
-            self.chat_history.append(f"Chief: {analysis}")
+            self.run_chat_job("Application analysis", self.chatbot.analyze_application, self.current_application)
         else:
             self.chat_history.append("Chief: No job application loaded. Please select an application first.")
 
     def compare_resume_application(self):
         if self.current_resume and self.current_application:
-            comparison = self.chatbot.compare_resume_application(self.current_resume, self.current_application)
-            self.chat_history.append(f"Chief: {comparison}")
+            self.run_chat_job("Resume comparison", self.chatbot.compare_resume_application,
+                              self.current_resume, self.current_application)
         else:
             self.chat_history.append("Chief: Both resume and job application need to be loaded for comparison.")
 
+    def rank_applications(self):
+        # Scores every tracked application locally, then spends LLM calls only
+        # on the best few matches.
+        if not self.current_resume:
+            self.chat_history.append("Chief: No resume loaded. Please select a resume first.")
+            return
+        if self.match_index is None or self.match_index.user_id != self.user_id:
+            self.match_index = MatchIndex(self.db, self.user_id)
+        user_id, resume_text = self.user_id, self.current_resume
+
+        def rank(job):
+            # The top matches' job descriptions are read here too, off the GUI thread
+            matches = self.match_index.rank(resume_text, Config.MATCH_TOP_K)
+            return [(self.db.get_application(user_id, application_id), score,
+                     self.db.get_job_description(user_id, application_id) if index < Config.MATCH_LLM_TOP_K else None)
+                    for index, (application_id, score) in enumerate(matches)]
+
+        def on_result(matches):
+            if not matches:
+                self.chat_history.append("Chief: There are no applications to rank yet.")
+                return
+            lines = [f"{rank}. {application[2]} - {application[3]} ({score:.0%} match)"
+                     for rank, (application, score, _) in enumerate(matches, 1)]
+            self.chat_history.append("Chief: Best matching applications:\n" + "\n".join(lines))
+            for application, _, job_description in matches[:Config.MATCH_LLM_TOP_K]:
+                self.run_chat_job(f"Comparison with {application[2]}", self.chatbot.compare_resume_application,
+                                  resume_text, job_description or f"{application[3]} at {application[2]}")
+
+        def on_error(message):
+            self.chat_history.append(f"Chief: Could not rank applications: {message}")
+
+        self.executor.submit(rank, description="Ranking applications", on_result=on_result, on_error=on_error)
+
+    def analyze_all_applications(self):
+        if not self.current_resume:
+            self.chat_history.append("Chief: No resume loaded. Please select a resume first.")
+            return
+        user_id, resume_id, resume_text = self.user_id, self.current_resume_id, self.current_resume
+
+        def analyze(job):
+            report = run_batch(self.chatbot, self.db, user_id, resume_id, resume_text,
+                               progress=lambda report: job.report_progress(report.summary()),
+                               is_cancelled=job.is_cancelled)
+            return report, self.db.get_analysis_results(user_id, resume_id)
+
+        def on_result(result):
+            report, results = result
+            self.chat_history.append(f"Chief: Batch comparison finished: {report.summary()}")
+            self.append_batch_results(results)
+
+        def on_error(message):
+            self.chat_history.append(f"Chief: Batch comparison failed: {message}")
+
+        def on_cancelled():
+            self.chat_history.append("Chief: Batch comparison cancelled; finished results were saved.")
+
+        self.chat_history.append("Chief: Comparing your resume with all applications in the background...")
+        self.executor.submit(analyze, description="Batch comparison", on_result=on_result, on_error=on_error,
+                             on_progress=self.progress_label.setText, on_cancelled=on_cancelled)
+
+    def show_batch_results(self):
+        # Results saved by earlier batch comparisons of the current resume,
+        # including runs that were cancelled or made from the command line
+        if not self.current_resume:
+            self.chat_history.append("Chief: No resume loaded. Please select a resume first.")
+            return
+        user_id, resume_id = self.user_id, self.current_resume_id
+        self.executor.submit(lambda job: self.db.get_analysis_results(user_id, resume_id),
+                             description="Loading batch results", on_result=self.append_batch_results,
+                             on_error=lambda message: self.chat_history.append(
+                                 f"Chief: Could not load batch results: {message}"))
+
+    def append_batch_results(self, results):
+        if results:
+            self.chat_history.append(f"Chief: Batch comparison results:\n\n{format_results(results)}")
+        else:
+            self.chat_history.append("Chief: No batch comparison results for this resume yet.")
+
     def generate_cover_letter(self, user_id, filename):
         try:
             if self.current_resume and self.current_application:
                 # Example of cover letter generation logic
                 cover_letter = f"Dear Hiring Manager,\n\nI am writing to express my interest in the {filename} position at your esteemed company. Based on my resume and the job application, I believe I am a strong fit for this role. Please find my detailed resume and application attached for your consideration.\n\nSincerely,\n[Your Name]"
                 self.chat_history.append(f"Chief: {cover_letter}")
-                logging.info("Cover letter generated.")
+                logger.info("Cover letter generated.")
                 self.speak_text("Cover letter generated.")
             else:
                 raise ValueError("Both resume and job application must be loaded before generating a cover letter.")
         except Exception as e:
-            logging.error(f"Error generating cover letter: {str(e)}")
+            logger.error(f"Error generating cover letter: {str(e)}")
             self.chat_history.append(f"Chief: Error generating cover letter: {str(e)}")
             self.speak_text(f"Error generating cover letter: {str(e)}")
@@ -0,0 +1,108 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class ApplicationTableModel(QAbstractTableModel):
+    # Rows are (id, company, position, contact_person, date), newest first.
+    # Pages are loaded on demand with keyset queries as the view scrolls, and
+    # single adds/deletes are applied in place rather than reloading the list.
+    # While a search is active the rows are the ranked full-text matches.
+    HEADERS = ["Company", "Position", "Contact Person", "Date"]
+    PAGE_SIZE = 200
+    SEARCH_LIMIT = 200
+
+    def __init__(self, db, user_id, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+        self.rows = []
+        self.has_more = True
+        self.search_text = ""
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return row[index.column() + 1]
+        if role == Qt.UserRole:
+            return row[0]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.has_more:
+            return
+        after = (self.rows[-1][4], self.rows[-1][0]) if self.rows else None
+        page = self.db.get_application_list_page(self.user_id, after, self.PAGE_SIZE)
+        self.has_more = len(page) == self.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def reload(self):
+        self.beginResetModel()
+        if self.search_text:
+            self.rows = self.db.search_applications(self.user_id, self.search_text, self.SEARCH_LIMIT)
+            self.has_more = False
+        else:
+            self.rows = []
+            self.has_more = True
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_search(self, text):
+        self.search_text = text.strip()
+        self.reload()
+
+    def application_id(self, row):
+        return self.rows[row][0]
+
+    def find_row(self, application_id):
+        for row, values in enumerate(self.rows):
+            if values[0] == application_id:
+                return row
+        return None
+
+    def insert_application(self, application_id):
+        if self.search_text:
+            self.reload()  # Let the search decide whether and where the new row belongs
+            return
+        values = self.db.get_application_list_row(self.user_id, application_id)
+        if values is None:
+            return
+        # Binary search for the (date, id) descending position
+        key = (values[4], values[0])
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            if (self.rows[middle][4], self.rows[middle][0]) > key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.rows) and self.has_more:
+            return  # Beyond the loaded pages; it will arrive with a later fetchMore
+        self.beginInsertRows(QModelIndex(), low, low)
+        self.rows.insert(low, values)
+        self.endInsertRows()
+
+    def remove_application(self, application_id):
+        row = self.find_row(application_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = '1000,10000,100000'
+BATCH_APPLICATIONS = 50
+
+
+def timed(fn, repeat, setup=None, per_item=1):
+    # Seconds per run (or per item, for runs over a list of inputs), after
+    # one untimed warm-up run; setup() runs untimed before every run.
+    times = []
+    for run in range(repeat + 1):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        if run:
+            times.append(elapsed / per_item)
+    return {
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'runs': len(times),
+    }
+
+
+def benchmark_dataset(results, query_plans, path, size, repeat, executor):
+    from modules.database import Database
+    from synthetic_data import USERNAME
+    from ui_components import ApplicationTrackingTab, ResumeManagementTab
+
+    db = Database(path)
+    # Checked on real data: the planner's choices depend on table statistics
+    problems = db.check_query_plans()
+    if problems:
+        query_plans[size] = problems
+    user_id = db.get_user(USERNAME)[0]
+    results[f'db.get_applications@{size}'] = timed(lambda: db.get_applications(user_id), repeat)
+    results[f'db.get_resumes@{size}'] = timed(lambda: db.get_resumes(user_id), repeat)
+    results[f'db.get_application_list_page@{size}'] = timed(
+        lambda: db.get_application_list_page(user_id, None, 200), repeat)
+    application_tab = ApplicationTrackingTab(user_id, db, executor)
+    results[f'ui.load_applications@{size}'] = timed(application_tab.load_applications, repeat)
+    resume_tab = ResumeManagementTab(user_id, db, executor)
+    results[f'ui.load_resumes@{size}'] = timed(resume_tab.load_resumes, repeat)
+    application_tab.deleteLater()
+    resume_tab.deleteLater()
+    return db, user_id
+
+
+def benchmark_parsing(results, documents, repeat):
+    from modules.resume_parser import read_docx, read_pdf
+
+    pdfs = [content for filename, content in documents if filename.endswith('.pdf')]
+    docxs = [content for filename, content in documents if filename.endswith('.docx')]
+    results['parse.read_pdf'] = timed(lambda: [read_pdf(content) for content in pdfs], repeat, per_item=len(pdfs))
+    results['parse.read_docx'] = timed(lambda: [read_docx(content) for content in docxs], repeat,
+                                       per_item=len(docxs))
+
+
+def benchmark_chatbot(results, db, user_id, path, repeat, llm_delay):
+    from ai_chat import AIChatBot
+    from modules.batch_analysis import run_batch
+    from modules.llm_cache import ResponseCache
+    from stub_llm import StubChatModel
+
+    cache = ResponseCache(path)
+    chatbot = AIChatBot(cache=cache)
+    chatbot.chat_model = StubChatModel(delay=llm_delay)
+
+    filename = db.get_resumes(user_id)[0][1]
+    row = db.get_resume_text(user_id, filename)
+    resume_id, resume_text = row[0], row[1]
+    # A plain str is encoded on every call; the stored TokenizedText is sliced
+    long_text = '\n\n'.join(str(resume_text) for _ in range(20))
+    results['tokenize.truncate_text'] = timed(lambda: chatbot.truncate_text(long_text, 2000), repeat)
+    results['tokenize.truncate_text_indexed'] = timed(lambda: chatbot.truncate_text(resume_text, 200), repeat)
+
+    # Every run starts cold: no cached responses and no saved batch results
+    def reset():
+        cache.clear()
+        db.execute('DELETE FROM analysis_results WHERE resume_id = ?', (resume_id,))
+
+    results['e2e.analyze_resume'] = timed(lambda: chatbot.analyze_resume(resume_text), repeat, setup=reset)
+    application_ids = db.get_application_ids(user_id)[:BATCH_APPLICATIONS]
+
+    def batch():
+        report = run_batch(chatbot, db, user_id, resume_id, resume_text, application_ids)
+        if report.failed:
+            raise RuntimeError(f"Batch analysis failed: {report.summary()}")
+
+    results[f'e2e.batch_analysis[{len(application_ids)}]'] = timed(batch, repeat, setup=reset)
+    reset()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    from PyQt5.QtWidgets import QApplication
+    from job_executor import JobExecutor
+    from modules.connection import ConnectionManager
+    from synthetic_data import ensure_database, resume_documents
+
+    app = QApplication.instance() or QApplication([])
+    executor = JobExecutor()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    paths = {size: ensure_database(args.data_dir, size, args.resumes, args.seed) for size in sizes}
+
+    results = {}
+    query_plans = {}  # size -> {query name: plan} for hot queries that scan or sort
+    for size in sizes:
+        print(f"Benchmarking {size:,} applications")
+        db, user_id = benchmark_dataset(results, query_plans, paths[size], size, args.repeat, executor)
+        if size == sizes[0]:
+            # Parsing and the LLM paths do not depend on the number of applications
+            print("Benchmarking parsing, tokenizing and analysis")
+            benchmark_parsing(results, resume_documents(args.resumes, args.seed), args.repeat)
+            benchmark_chatbot(results, db, user_id, paths[size], args.repeat, args.llm_delay)
+        ConnectionManager.close_all()
+        app.processEvents()
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'resumes': args.resumes,
+            'repeat': args.repeat,
+            'llm_delay': args.llm_delay,
+            'seed': args.seed,
+        },
+        'results': results,
+        'query_plan_problems': query_plans,
+    }
+
+
+def print_results(report):
+    print(f"{'benchmark':42} {'median':>12} {'min':>12} {'max':>12}")
+    for name, result in report['results'].items():
+        print(f"{name:42} {result['median'] * 1000:10.3f}ms {result['min'] * 1000:10.3f}ms "
+              f"{result['max'] * 1000:10.3f}ms")
+
+
+def print_query_plan_problems(report):
+    for size, problems in report.get('query_plan_problems', {}).items():
+        for name, plan in problems.items():
+            print(f"Query plan problem at {size} applications: {name} uses {'; '.join(plan)}")
+
+
+def compare(baseline, current, threshold, min_delta):
+    # A benchmark regresses when its median is more than `threshold` (a
+    # fraction) slower than the baseline and by more than min_delta seconds;
+    # the absolute floor keeps microsecond-scale noise from failing a run.
+    regressions = []
+    print(f"{'benchmark':42} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"{name:42} {'-':>12} {result['median'] * 1000:10.3f}ms {'new':>8}")
+            continue
+        change = result['median'] / old['median'] - 1 if old['median'] else 0.0
+        regressed = change > threshold and result['median'] - old['median'] > min_delta
+        print(f"{name:42} {old['median'] * 1000:10.3f}ms {result['median'] * 1000:10.3f}ms {change:+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark database, UI, parsing, tokenizing and LLM analysis paths")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma-separated application counts")
+    parser.add_argument('--resumes', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--llm-delay', type=float, default=0.05, help="Seconds the stub LLM takes per call")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'captain-benchmarks'),
+                        help="Where generated databases are cached between runs")
+    parser.add_argument('--output', help="Save the results as JSON")
+    parser.add_argument('--baseline', help="Results JSON to compare against; exits 1 on a regression")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="Compare two saved results files without running anything")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown, as a fraction")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (load(path) for path in args.compare)
+    else:
+        baseline = load(args.baseline) if args.baseline else None
+        current = run(args)
+        print_results(current)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(current, file, indent=2)
+            print(f"Results saved to {args.output}")
+    # A hot query that scans a table or sorts in a temporary b-tree fails the
+    # run whatever the timings say
+    print_query_plan_problems(current)
+    failed = bool(current.get('query_plan_problems'))
+    if baseline is not None:
+        regressions = compare(baseline, current, args.threshold, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, ROOT)
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark-password'
+
+
+def run_child():
+    # One cold start: the login dialog is answered automatically and the
+    # moments it appears and the first tab is on screen are reported.
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    import main
+    import ui_components
+
+    marks = {}
+    exec_dialog = ui_components.LoginDialog.exec_
+
+    def exec_login(dialog):
+        marks['login_dialog'] = time.time()
+        dialog.username_input.setText(USERNAME)
+        dialog.password_input.setText(PASSWORD)
+        QTimer.singleShot(0, dialog.submit)
+        return exec_dialog(dialog)
+
+    ui_components.LoginDialog.exec_ = exec_login
+    QMessageBox.information = staticmethod(lambda *args: QMessageBox.Ok)
+    app = QApplication(sys.argv)
+    window = main.CAPTAINApp()
+    window.show()
+    window.show_login_dialog()
+    app.processEvents()
+    marks['first_tab'] = time.time()
+    window.warmup.done.wait()
+    marks['warmup_done'] = time.time()
+    marks['warmup_error'] = str(window.warmup.error) if window.warmup.error else None
+    print(json.dumps(marks))
+
+
+def measure(database_path):
+    env = dict(os.environ, DATABASE_URI=database_path, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'),
+               OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'sk-benchmark'))
+    started = time.time()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    marks = json.loads(output.strip().splitlines()[-1])
+    return {
+        'time_to_login_dialog': marks['login_dialog'] - started,
+        'time_to_first_tab': marks['first_tab'] - started,
+        'time_to_warmup_done': marks['warmup_done'] - started,
+        'warmup_error': marks['warmup_error'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start time to the login dialog and first tab")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        run_child()
+        return 0
+
+    sys.path.insert(0, ROOT)
+    from modules.database import Database
+    from modules.user_management import UserManagement
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'startup.db')
+        db = Database(database_path)
+        UserManagement(db).register_user(USERNAME, PASSWORD)
+        db.close()
+        runs = [measure(database_path) for _ in range(args.runs)]
+
+    results = {metric: statistics.median(run[metric] for run in runs)
+               for metric in ('time_to_login_dialog', 'time_to_first_tab', 'time_to_warmup_done')}
+    results['runs'] = len(runs)
+    results['warmup_error'] = runs[-1]['warmup_error']
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for metric in ('time_to_login_dialog', 'time_to_first_tab', 'time_to_warmup_done'):
+            print(f"{metric:24} {results[metric] * 1000:8.0f} ms (median of {len(runs)})")
+        if results['warmup_error']:
+            print(f"warm-up failed: {results['warmup_error']}")
+    return 0
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        sys.path.insert(0, ROOT)
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class StubChatModel:
+    # Stands in for ChatOpenAI as AIChatBot.chat_model: every call answers
+    # after a fixed delay without touching the network, so benchmarks measure
+    # the application's own work around the LLM and nothing else.
+    def __init__(self, delay=0.05, reply_words=150, model_name='stub-model', temperature=0.7):
+        self.delay = delay
+        self.model_name = model_name
+        self.temperature = temperature
+        self.reply = ' '.join(f"word{number % 50}" for number in range(reply_words)) + '.'
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def record_call(self):
+        with self.lock:
+            self.calls += 1
+
+    def invoke(self, messages, config=None, **kwargs):
+        self.record_call()
+        time.sleep(self.delay)
+        return AIMessage(content=self.reply)
+
+    def stream(self, messages, config=None, **kwargs):
+        # The whole delay is spent before the first token, as with a real API
+        self.record_call()
+        time.sleep(self.delay)
+        for word in self.reply.split(' '):
+            yield AIMessageChunk(content=word + ' ')
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        self.record_call()
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=self.reply)
+
+    def batch(self, inputs, config=None, **kwargs):
+        max_concurrency = (config or {}).get('max_concurrency') or len(inputs) or 1
+        with ThreadPoolExecutor(max_concurrency) as pool:
+            return list(pool.map(self.invoke, inputs))
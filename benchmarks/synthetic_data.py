@@ -0,0 +1,182 @@
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Bump when the generated data changes, so cached databases are rebuilt
+GENERATOR_VERSION = 1
+USERNAME = 'benchmark'
+BATCH_SIZE = 5000
+
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises', 'Cyberdyne',
+             'Soylent', 'Tyrell', 'Wonka', 'Aperture', 'Massive Dynamic', 'Vandelay', 'Pied Piper', 'Oscorp']
+POSITIONS = ['Software Engineer', 'Senior Software Engineer', 'Data Scientist', 'Data Engineer', 'Product Manager',
+             'DevOps Engineer', 'QA Engineer', 'Engineering Manager', 'Frontend Developer', 'Backend Developer',
+             'Machine Learning Engineer', 'Site Reliability Engineer', 'Technical Writer', 'Solutions Architect']
+SKILLS = ['Python', 'Java', 'Go', 'Rust', 'TypeScript', 'React', 'Django', 'Flask', 'PostgreSQL', 'SQLite', 'Redis',
+          'Kafka', 'Docker', 'Kubernetes', 'Terraform', 'AWS', 'GCP', 'Azure', 'PyTorch', 'TensorFlow', 'pandas',
+          'Spark', 'Airflow', 'GraphQL', 'REST APIs', 'CI/CD', 'Linux', 'Qt', 'C++', 'Scala']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Silva', 'Kowalski', 'Haddad', 'Tanaka', 'Murphy']
+WORDS = ('design build maintain scalable reliable services team customers data pipelines platform features '
+         'collaborate cross-functional stakeholders improve performance latency throughput ownership mentor '
+         'review code quality testing automation deploy monitor production incidents roadmap deliver').split()
+
+
+def sentence(rng, words=14):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def job_description(rng):
+    skills = rng.sample(SKILLS, 6)
+    return '\n\n'.join([
+        ' '.join(sentence(rng) for _ in range(3)),
+        'Requirements: ' + ', '.join(skills[:4]) + '. ' + sentence(rng),
+        'Nice to have: ' + ', '.join(skills[4:]) + '. ' + sentence(rng),
+        'Responsibilities: ' + ' '.join(sentence(rng) for _ in range(3)),
+    ])
+
+
+def application_rows(rng, count):
+    # (company, position, job_description, contact_person, date), as Database.add_applications takes them
+    today = datetime.date.today()
+    for _ in range(count):
+        yield (rng.choice(COMPANIES), rng.choice(POSITIONS), job_description(rng),
+               f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+               (today - datetime.timedelta(days=rng.randrange(3 * 365))).isoformat())
+
+
+def resume_lines(rng):
+    lines = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(POSITIONS), '', 'SUMMARY',
+             sentence(rng, 20), '', 'EXPERIENCE']
+    for _ in range(rng.randint(3, 6)):
+        start = rng.randint(2005, 2020)
+        lines += ['', f"{rng.choice(POSITIONS)}, {rng.choice(COMPANIES)} ({start} - {start + rng.randint(1, 4)})"]
+        lines += [f"- {sentence(rng, 12)}" for _ in range(rng.randint(3, 6))]
+    lines += ['', 'SKILLS', ', '.join(rng.sample(SKILLS, 10)), '', 'EDUCATION', 'B.Sc. Computer Science']
+    return lines
+
+
+def pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(lines, lines_per_page=48):
+    # A minimal PDF written by hand: Helvetica text, one content stream per
+    # page, and a correct cross-reference table, which is all PyPDF2 needs.
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]]
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_numbers = []
+    for page in pages:
+        text = ''.join(f"({pdf_string(line)}) Tj T* " for line in page)
+        stream = f"BT /F1 10 Tf 14 TL 50 750 Td {text}ET".encode('latin-1', 'replace')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        page_numbers.append(len(objects))
+    kids = ' '.join(f"{number} 0 R" for number in page_numbers).encode()
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(pages))
+
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    output.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return output.getvalue()
+
+
+def make_docx(lines):
+    import docx
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def resume_documents(count, seed=0):
+    # [(filename, content)], alternating PDF and DOCX
+    rng = random.Random(seed)
+    documents = []
+    for number in range(count):
+        lines = resume_lines(rng)
+        if number % 2 == 0:
+            documents.append((f"resume_{number:04d}.pdf", make_pdf(lines)))
+        else:
+            documents.append((f"resume_{number:04d}.docx", make_docx(lines)))
+    return documents
+
+
+def generate_database(path, applications, resumes, seed=0, progress=print):
+    import bcrypt
+    from modules.database import Database
+    from modules.resume_parser import extract_resume
+
+    db = Database(path)
+    try:
+        db.add_user(USERNAME, bcrypt.hashpw(b'benchmark-password', bcrypt.gensalt(4)))
+        user_id = db.get_user(USERNAME)[0]
+        rng = random.Random(seed)
+        for start in range(0, applications, BATCH_SIZE):
+            db.add_applications(user_id, application_rows(rng, min(BATCH_SIZE, applications - start)))
+            progress(f"  {min(start + BATCH_SIZE, applications):,} / {applications:,} applications")
+        for filename, content in resume_documents(resumes, seed):
+            resume_id = db.add_resume(user_id, filename, content)
+            extracted = extract_resume(filename, content)
+            db.save_resume_text(resume_id, extracted['text'], extracted['page_count'], extracted['token_count'],
+                                extracted['token_offsets'])
+        progress(f"  {resumes} resumes")
+    finally:
+        db.close()
+
+
+def ensure_database(data_dir, applications, resumes, seed=0, progress=print):
+    # Generated databases are kept in data_dir and reused by later runs; a
+    # half-written one is never picked up because it is renamed into place last.
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"captain-v{GENERATOR_VERSION}-{applications}apps-{resumes}resumes-seed{seed}.db")
+    if not os.path.exists(path):
+        progress(f"Generating {os.path.basename(path)}")
+        started = time.perf_counter()
+        partial = path + '.partial'
+        for leftover in (partial, partial + '-wal', partial + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        generate_database(partial, applications, resumes, seed, progress)
+        os.replace(partial, path)
+        progress(f"  done in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic CAPTAIN database for benchmarks")
+    parser.add_argument('output', help="Database file to create")
+    parser.add_argument('--applications', type=int, default=10000)
+    parser.add_argument('--resumes', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--documents', help="Also write the resume PDF/DOCX files to this directory")
+    args = parser.parse_args(argv)
+    if os.path.exists(args.output):
+        parser.error(f"{args.output} already exists")
+    generate_database(args.output, args.applications, args.resumes, args.seed)
+    if args.documents:
+        os.makedirs(args.documents, exist_ok=True)
+        for filename, content in resume_documents(args.resumes, args.seed):
+            with open(os.path.join(args.documents, filename), 'wb') as file:
+                file.write(content)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, ROOT)
+    sys.exit(main())
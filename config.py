@@ -7,5 +7,36 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DATABASE_URI = os.getenv('DATABASE_URI', 'captain1.db')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    # Unset: calibrated on first use to take about BCRYPT_TARGET_MS on this host
+    BCRYPT_COST = int(os.getenv('BCRYPT_COST', '0')) or None
+    BCRYPT_TARGET_MS = int(os.getenv('BCRYPT_TARGET_MS', '250'))
+    LOG_FILE = os.getenv('LOG_FILE', 'captain_app.log')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_CONSOLE_LEVEL = os.getenv('LOG_CONSOLE_LEVEL', 'WARNING')
+    # Per-logger overrides, e.g. "modules.database=DEBUG,httpx=INFO"
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    # Timings and counters for the Diagnostics tab; cheap enough to leave on
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1') not in ('0', 'false', 'False', '')
+    METRICS_DIR = os.getenv('METRICS_DIR', 'metrics')
+    SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', '20000'))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '2'))
+    INTERACTIVE_MAX_CONCURRENCY = int(os.getenv('INTERACTIVE_MAX_CONCURRENCY', '2'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    CHUNK_TOKENS = int(os.getenv('CHUNK_TOKENS', '3000'))
+    CHUNK_CONCURRENCY = int(os.getenv('CHUNK_CONCURRENCY', '4'))
+    CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', '3000'))
+    CHAT_SUMMARY_TOKENS = int(os.getenv('CHAT_SUMMARY_TOKENS', '500'))
+    CHAT_PINNED_TOKENS = int(os.getenv('CHAT_PINNED_TOKENS', '1000'))
+    INTENT_MIN_SCORE = float(os.getenv('INTENT_MIN_SCORE', '0.7'))
+    VOICE_BACKEND = os.getenv('VOICE_BACKEND', 'google')
+    MATCH_TOP_K = int(os.getenv('MATCH_TOP_K', '10'))
+    MATCH_LLM_TOP_K = int(os.getenv('MATCH_LLM_TOP_K', '3'))
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+    BATCH_MAX_RETRIES = int(os.getenv('BATCH_MAX_RETRIES', '5'))
+    BATCH_RETRY_BASE_SECONDS = float(os.getenv('BATCH_RETRY_BASE_SECONDS', '2'))
 
-config = Config()
\ No newline at end of file
+config = Config()
@@ -0,0 +1,156 @@
+import logging
+import time
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QLabel,
+                             QComboBox, QPlainTextEdit, QFileDialog, QAbstractItemView)
+from modules.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+SPAN_COLUMNS = ["Span", "Count", "Errors", "Mean ms", "p50 ms", "p95 ms", "Max ms", "Total s"]
+ANY_JOB = "Next background job"
+
+
+class DiagnosticsTab(QWidget):
+    # Live view of the tracer: where the time goes, how many tokens and bytes
+    # went through, and a cProfile of one chosen action.
+    def __init__(self, refresh_interval=2000):
+        super().__init__()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(refresh_interval)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.shown_profile = None
+        self.span_names = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_btn)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        button_layout.addWidget(reset_btn)
+        export_btn = QPushButton("Export Metrics")
+        export_btn.clicked.connect(self.export_metrics)
+        button_layout.addWidget(export_btn)
+        layout.addLayout(button_layout)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.span_table = self.make_table(SPAN_COLUMNS)
+        layout.addWidget(self.span_table, 3)
+        self.counter_table = self.make_table(["Counter", "Total"])
+        layout.addWidget(self.counter_table, 1)
+
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Profile:"))
+        self.profile_target = QComboBox()
+        self.profile_target.setEditable(True)
+        profile_layout.addWidget(self.profile_target, 1)
+        self.profile_btn = QPushButton("Profile Next Run")
+        self.profile_btn.clicked.connect(self.arm_profile)
+        profile_layout.addWidget(self.profile_btn)
+        self.save_profile_btn = QPushButton("Save Profile...")
+        self.save_profile_btn.clicked.connect(self.save_profile)
+        self.save_profile_btn.setEnabled(False)
+        profile_layout.addWidget(self.save_profile_btn)
+        layout.addLayout(profile_layout)
+
+        self.profile_output = QPlainTextEdit()
+        self.profile_output.setReadOnly(True)
+        self.profile_output.setPlaceholderText("Choose a span, press Profile Next Run, then perform the action.")
+        layout.addWidget(self.profile_output, 2)
+
+        self.setLayout(layout)
+        self.refresh()
+
+    def make_table(self, columns):
+        table = QTableWidget(0, len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.verticalHeader().hide()
+        return table
+
+    def fill_table(self, table, rows):
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(value))
+        table.resizeColumnsToContents()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def refresh(self):
+        snapshot = tracer.snapshot()
+        spans = sorted(snapshot['spans'].items(), key=lambda item: item[1]['total'], reverse=True)
+        self.fill_table(self.span_table, [
+            (name, str(span['count']), str(span['errors']), f"{span['mean'] * 1000:.2f}",
+             f"{span['p50'] * 1000:.2f}", f"{span['p95'] * 1000:.2f}", f"{span['max'] * 1000:.2f}",
+             f"{span['total']:.3f}")
+            for name, span in spans
+        ])
+        self.fill_table(self.counter_table, [(name, f"{value:,}") for name, value in snapshot['counters'].items()])
+
+        if list(snapshot['spans']) != self.span_names:
+            self.span_names = list(snapshot['spans'])
+            current = self.profile_target.currentText()
+            self.profile_target.clear()
+            self.profile_target.addItem(ANY_JOB)
+            self.profile_target.addItems(self.span_names)
+            self.profile_target.setCurrentText(current or ANY_JOB)
+
+        if not tracer.enabled:
+            self.summary_label.setText("Tracing is disabled (TRACING_ENABLED=0).")
+        else:
+            uptime = snapshot['taken_at'] - snapshot['started_at']
+            recorded = sum(span['count'] for span in snapshot['spans'].values())
+            self.summary_label.setText(f"Collecting for {uptime / 60:.1f} minutes; {recorded:,} spans recorded.")
+        self.profile_btn.setText("Waiting..." if tracer.profile_target is not None else "Profile Next Run")
+        self.show_profile()
+
+    def show_profile(self):
+        profile = tracer.last_profile
+        if profile is None or profile is self.shown_profile:
+            return
+        self.shown_profile = profile
+        started = time.strftime('%H:%M:%S', time.localtime(profile['at'] - profile['seconds']))
+        self.profile_output.setPlainText(
+            f"{profile['span']} at {started}, {profile['seconds'] * 1000:.1f} ms\n{profile['stats']}")
+        self.save_profile_btn.setEnabled(True)
+
+    def arm_profile(self):
+        target = self.profile_target.currentText().strip()
+        tracer.arm_profile('job.' if target in ('', ANY_JOB) else target)
+        self.refresh()
+
+    def reset(self):
+        tracer.reset()
+        self.refresh()
+
+    def export_metrics(self):
+        try:
+            paths = tracer.export()
+            self.status_label.setText(f"Metrics written to {', '.join(paths)}")
+        except OSError as e:
+            logger.error(f"Error exporting metrics: {str(e)}")
+            self.status_label.setText(f"Could not export metrics: {str(e)}")
+
+    def save_profile(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "captain.prof", "Profile Data (*.prof)")
+        if file_path and tracer.save_profile(file_path):
+            self.status_label.setText(f"Profile saved to {file_path}")
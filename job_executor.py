@@ -0,0 +1,146 @@
+import itertools
+import logging
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from config import Config
+from modules.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(BaseException):
+    # Derives from BaseException, like asyncio.CancelledError, so that the
+    # broad "except Exception" handlers in the chatbot do not swallow it.
+    pass
+
+
+class JobSignals(QObject):
+    started = pyqtSignal(int)
+    progress = pyqtSignal(int, str)
+    token = pyqtSignal(int, str)
+    result = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+    finished = pyqtSignal(int)
+
+
+class Job(QRunnable):
+    # The wrapped callable receives the job as its first argument so it can
+    # report progress and check for cancellation between steps.
+    def __init__(self, job_id, description, fn, args, kwargs, trace_name=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job_id = job_id
+        self.description = description
+        self.trace_name = trace_name or 'job.' + ('_'.join(description.lower().split()) or 'unnamed')
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.pool = None  # the JobExecutor pool it runs on
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def report_progress(self, message):
+        if not self.is_cancelled():
+            self.signals.progress.emit(self.job_id, message)
+
+    def emit_token(self, text):
+        self.check_cancelled()
+        self.signals.token.emit(self.job_id, text)
+
+    def run(self):
+        if self.is_cancelled():
+            self.signals.cancelled.emit(self.job_id)
+            self.signals.finished.emit(self.job_id)
+            return
+        self.signals.started.emit(self.job_id)
+        try:
+            with tracer.span(self.trace_name):
+                result = self.fn(self, *self.args, **self.kwargs)
+            # A job cancelled mid-flight still runs to completion, but nobody
+            # is waiting for its result any more.
+            if self.is_cancelled():
+                self.signals.cancelled.emit(self.job_id)
+            else:
+                self.signals.result.emit(self.job_id, result)
+        except JobCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except Exception as e:
+            logger.error(f"Error in background job '{self.description}': {str(e)}", exc_info=True)
+            self.signals.error.emit(self.job_id, str(e))
+        finally:
+            self.signals.finished.emit(self.job_id)
+
+
+class JobExecutor(QObject):
+    active_jobs_changed = pyqtSignal(list)  # descriptions of queued and running jobs
+
+    def __init__(self, max_concurrency=None, interactive_concurrency=None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_concurrency or Config.LLM_MAX_CONCURRENCY)
+        # Sign-in and chat replies get threads of their own, so a batch
+        # analysis or an import holding every background thread cannot keep
+        # the user waiting on them
+        self.interactive_pool = QThreadPool(self)
+        self.interactive_pool.setMaxThreadCount(interactive_concurrency or Config.INTERACTIVE_MAX_CONCURRENCY)
+        self.jobs = {}
+        self._job_ids = itertools.count(1)
+
+    def submit(self, fn, *args, description="", on_result=None, on_error=None, on_progress=None,
+               on_cancelled=None, on_token=None, trace_name=None, interactive=False, **kwargs):
+        # trace_name defaults to "job.<description>"; pass one when the
+        # description varies, so the timings still add up under one name.
+        # interactive is for short jobs the user is waiting on.
+        job = Job(next(self._job_ids), description, fn, args, kwargs, trace_name)
+        job.pool = self.interactive_pool if interactive else self.pool
+        if on_result:
+            job.signals.result.connect(lambda job_id, value: on_result(value))
+        if on_error:
+            job.signals.error.connect(lambda job_id, message: on_error(message))
+        if on_progress:
+            job.signals.progress.connect(lambda job_id, message: on_progress(message))
+        if on_token:
+            job.signals.token.connect(lambda job_id, text: on_token(text))
+        if on_cancelled:
+            job.signals.cancelled.connect(lambda job_id: on_cancelled())
+        job.signals.finished.connect(self._job_finished)
+
+        self.jobs[job.job_id] = job
+        job.pool.start(job)
+        self._emit_active_jobs()
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        job.cancel()
+        # Jobs still waiting in the queue can be dropped outright.
+        if job.pool.tryTake(job):
+            job.signals.cancelled.emit(job_id)
+            job.signals.finished.emit(job_id)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def wait_for_done(self, msecs=-1):
+        return self.pool.waitForDone(msecs) and self.interactive_pool.waitForDone(msecs)
+
+    def _job_finished(self, job_id):
+        self.jobs.pop(job_id, None)
+        self._emit_active_jobs()
+
+    def _emit_active_jobs(self):
+        self.active_jobs_changed.emit([job.description for job in self.jobs.values()])
@@ -1,24 +1,91 @@
 import sys
 import logging
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QVBoxLayout, QWidget, QMessageBox, QDialog
+import threading
+from functools import partial
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QVBoxLayout, QWidget, QMessageBox, QDialog, QLabel
+from PyQt5.QtCore import Qt
 from ui_components import LoginDialog, RegistrationDialog, ResumeManagementTab, ApplicationTrackingTab
-from ai_chat_tab import AIChatTab
 from modules.user_management import UserManagement
 from modules.database import Database
-from ai_chat import AIChatBot
+from job_executor import JobExecutor
+from modules.logging_setup import setup_logging, stop_logging
+from modules.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+TAB_TITLES = ["Resume Management", "Application Tracking", "AI Chat", "Diagnostics"]
+TAB_FACTORIES = ["build_resume_tab", "build_application_tab", "build_chat_tab", "build_diagnostics_tab"]
+
+class Warmup:
+    # Opens the database, then imports langchain, tiktoken, SciPy and the
+    # document parsers and builds the chatbot, all on a background thread, so
+    # the login dialog only waits for Qt and signing in overlaps the rest.
+    def __init__(self):
+        self.db_ready = threading.Event()
+        self.done = threading.Event()
+        self.db = None
+        self.user_manager = None
+        self.chatbot = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.db = Database()
+            self.user_manager = UserManagement(self.db)
+            self.db_ready.set()
+            # Importing the chat tab pulls in SciPy and the speech workers
+            import ai_chat_tab
+            import PyPDF2
+            import docx
+            from ai_chat import AIChatBot
+            self.chatbot = AIChatBot()
+        except Exception as e:
+            logger.error(f"Error warming up the application: {str(e)}", exc_info=True)
+            self.error = e
+        finally:
+            self.db_ready.set()
+            self.done.set()
+
+    def get_user_manager(self):
+        self.db_ready.wait()
+        if self.user_manager is None:
+            raise self.error
+        return self.user_manager
+
+    def get_chatbot(self):
+        # Blocks only if the chat tab is opened before warm-up has finished
+        self.done.wait()
+        if self.chatbot is None:
+            raise self.error
+        return self.chatbot
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class CAPTAINApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.user_manager = UserManagement()
-        self.db = Database()
         self.current_user_id = None
-        self.chatbot = AIChatBot()
+        self.warmup = Warmup()
+        self.warmup.start()
+        self.job_executor = JobExecutor(parent=self)
+        self.tabs = {}
         self.init_ui()
 
+    @property
+    def user_manager(self):
+        return self.warmup.get_user_manager()
+
+    @property
+    def db(self):
+        return self.user_manager.db
+
+    @property
+    def chatbot(self):
+        return self.warmup.get_chatbot()
+
     def init_ui(self):
         self.setWindowTitle("CAPTAIN")
         self.setGeometry(100, 100, 800, 600)
@@ -26,61 +93,167 @@ class CAPTAINApp(QMainWindow):
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
         self.tab_widget = QTabWidget()
+        self.tab_widget.currentChanged.connect(self.ensure_tab)
         layout.addWidget(self.tab_widget)
 
     def setup_tabs(self):
+        # Every tab starts as an empty page and is built the first time it is
+        # shown; the chat tab, and with it the chatbot, may never be needed.
+        self.tab_widget.blockSignals(True)
         self.tab_widget.clear()
-        resume_tab = ResumeManagementTab(user_id=self.current_user_id, database=self.db, parent=self.tab_widget)
-        application_tab = ApplicationTrackingTab(self.current_user_id, self.db)
-        ai_chat_tab = AIChatTab(self.chatbot, self.db)
+        self.tabs = {}
+        for title in TAB_TITLES:
+            page = QWidget()
+            QVBoxLayout(page).setContentsMargins(0, 0, 0, 0)
+            self.tab_widget.addTab(page, title)
+        self.tab_widget.blockSignals(False)
+        self.ensure_tab(self.tab_widget.currentIndex())
+
+    def ensure_tab(self, index):
+        # Returns None for a tab that failed to build; its page shows the
+        # error instead, and it is not retried
+        if index < 0 or index in self.tabs:
+            return self.tabs.get(index)
+        try:
+            tab = getattr(self, TAB_FACTORIES[index])()
+            page_content = tab
+        except Exception as e:
+            logger.error(f"Error building the {TAB_TITLES[index]} tab: {str(e)}", exc_info=True)
+            tab = None
+            page_content = QLabel(f"This tab could not be loaded: {str(e)}")
+            page_content.setAlignment(Qt.AlignCenter)
+        self.tabs[index] = tab
+        self.tab_widget.widget(index).layout().addWidget(page_content)
+        return tab
+
+    def chat_tab(self):
+        return self.ensure_tab(TAB_TITLES.index("AI Chat"))
+
+    def call_chat_tab(self, method, *args):
+        # The selection signals fire into here from slots, where an exception
+        # would abort the application, so an unavailable chat tab is skipped
+        chat_tab = self.chat_tab()
+        if chat_tab is None:
+            logger.warning(f"AI Chat tab is unavailable; ignoring {method}")
+            return False
+        getattr(chat_tab, method)(*args)
+        return True
+
+    def request_cover_letter(self, user_id, filename):
+        if not self.call_chat_tab('generate_cover_letter', user_id, filename):
+            QMessageBox.warning(self, "AI Chat Unavailable",
+                                "The AI Chat tab could not be loaded, so no cover letter can be generated.")
+
+    def build_resume_tab(self):
+        resume_tab = ResumeManagementTab(user_id=self.current_user_id, database=self.db,
+                                         executor=self.job_executor, parent=self.tab_widget)
+        # Resolved on use, so selecting a resume builds the chat tab only then
+        resume_tab.resume_selected.connect(
+            lambda user_id, filename: self.call_chat_tab('set_current_resume', user_id, filename))
+        resume_tab.cover_letter_requested.connect(self.request_cover_letter)
+        return resume_tab
 
-        resume_tab.resume_selected.connect(ai_chat_tab.set_current_resume)
-        application_tab.application_selected.connect(ai_chat_tab.set_current_application)
-        resume_tab.cover_letter_requested.connect(ai_chat_tab.generate_cover_letter)
+    def build_application_tab(self):
+        application_tab = ApplicationTrackingTab(self.current_user_id, self.db, self.job_executor)
+        application_tab.application_selected.connect(
+            lambda user_id, application_id: self.call_chat_tab('set_current_application', user_id, application_id))
+        return application_tab
 
-        self.tab_widget.addTab(resume_tab, "Resume Management")
-        self.tab_widget.addTab(application_tab, "Application Tracking")
-        self.tab_widget.addTab(ai_chat_tab, "AI Chat")
+    def build_chat_tab(self):
+        from ai_chat_tab import AIChatTab
+        return AIChatTab(self.chatbot, self.db, self.job_executor, self.current_user_id)
+
+    def build_diagnostics_tab(self):
+        from diagnostics_tab import DiagnosticsTab
+        return DiagnosticsTab()
 
     def show_login_dialog(self):
-        logging.info("Showing login dialog")
-        dialog = LoginDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            username = dialog.username_input.text()
-            password = dialog.password_input.text()
-            logging.info(f"Login attempt for user: {username}")
-            success, user = self.user_manager.authenticate_user(username, password)
+        # A failed login stays in the dialog and registering comes back to it,
+        # so this loops instead of re-opening itself recursively.
+        while True:
+            logger.info("Showing login dialog")
+            dialog = LoginDialog(self)
+            dialog.credentials_submitted.connect(partial(self.authenticate, dialog))
+            result = dialog.exec_()
+            if result == LoginDialog.REGISTER:
+                self.show_registration_dialog()
+                continue
+            if result == QDialog.Accepted:
+                QMessageBox.information(self, "Login Successful", f"Welcome, {dialog.username_input.text()}!")
+                self.setup_tabs()
+            else:
+                logger.info("Login dialog cancelled")
+                self.close()  # Close the application if login is cancelled
+            return
+
+    def authenticate(self, dialog, username, password):
+        # bcrypt runs on the executor; the dialog stays responsive meanwhile
+        logger.info(f"Login attempt for user: {username}")
+        dialog.set_busy("Signing in...")
+
+        def on_result(result):
+            success, user = result
+            if not dialog.isVisible():
+                return
             if success:
                 self.current_user_id = user[0]  # Assuming user id is at index 0
-                logging.info(f"Login successful for user: {username}")
-                QMessageBox.information(self, "Login Successful", f"Welcome, {username}!")
-                self.setup_tabs()
+                logger.info(f"Login successful for user: {username}", extra={'event': 'login', 'success': True})
+                dialog.accept()
             else:
-                logging.warning(f"Login failed for user: {username}")
-                QMessageBox.warning(self, "Login Failed", "Invalid username or password")
-                self.show_login_dialog()
-        else:
-            logging.info("Login dialog cancelled")
-            self.close()  # Close the application if login is cancelled
+                logger.warning(f"Login failed for user: {username}", extra={'event': 'login', 'success': False})
+                dialog.show_error("Invalid username or password")
+
+        self.job_executor.submit(lambda job: self.user_manager.authenticate_user(username, password),
+                                 description="Signing in", on_result=on_result, interactive=True,
+                                 on_error=lambda message: dialog.show_error(f"Could not sign in: {message}"))
 
     def show_registration_dialog(self):
         dialog = RegistrationDialog(self)
+        dialog.credentials_submitted.connect(partial(self.register, dialog))
         if dialog.exec_() == QDialog.Accepted:
-            username = dialog.username_input.text()
-            password = dialog.password_input.text()
-            success, message = self.user_manager.register_user(username, password)
+            QMessageBox.information(self, "Registration Successful", "User registered successfully")
+
+    def register(self, dialog, username, password):
+        dialog.set_busy("Registering...")
+
+        def on_result(result):
+            success, message = result
             if success:
-                QMessageBox.information(self, "Registration Successful", message)
-                self.show_login_dialog()
+                dialog.accept()
             else:
-                QMessageBox.warning(self, "Registration Failed", message)
-                self.show_registration_dialog()
+                dialog.show_error(message)
+
+        self.job_executor.submit(lambda job: self.user_manager.register_user(username, password),
+                                 description="Registering", on_result=on_result, interactive=True,
+                                 on_error=lambda message: dialog.show_error(f"Could not register: {message}"))
+
+def export_metrics():
+    # Leaves the session's timings in METRICS_DIR for offline comparison
+    if tracer.enabled:
+        try:
+            tracer.export()
+        except OSError as e:
+            logger.error(f"Error exporting metrics: {str(e)}")
+
+def shutdown(main_window, listener):
+    # Running jobs get a few seconds to finish before the database they use is closed
+    main_window.job_executor.cancel_all()
+    main_window.job_executor.wait_for_done(5000)
+    chatbot = main_window.warmup.chatbot
+    if chatbot:
+        logger.info(f"Intent fast-path: {chatbot.intents.stats()}; response cache: {chatbot.cache.stats()}")
+    if main_window.warmup.db:
+        main_window.warmup.db.close()
+    export_metrics()
+    stop_logging(listener)
 
 def main():
+    listener = setup_logging()
     app = QApplication(sys.argv)
     main_window = CAPTAINApp()
     main_window.show()
     main_window.show_login_dialog()  # Display the login dialog
+    app.aboutToQuit.connect(lambda: shutdown(main_window, listener))
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
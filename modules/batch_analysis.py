@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+import openai
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: the request never produced an answer, but the same
+# request may well succeed a little later.
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+MAX_RETRY_DELAY_SECONDS = 60
+
+
+class BatchReport:
+    def __init__(self, total, skipped=0):
+        self.total = total
+        self.skipped = skipped  # already analysed by an earlier run
+        self.done = 0
+        self.failed = 0
+        self.retries = 0
+        self.started = time.monotonic()
+
+    def completed(self):
+        return self.done + self.failed
+
+    def throughput(self):
+        # Analyses per minute since the run started
+        elapsed = time.monotonic() - self.started
+        return self.completed() * 60 / elapsed if elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.completed()}/{self.total} applications analysed ({self.failed} failed, "
+                f"{self.retries} retries, {self.skipped} already done), {self.throughput():.1f} per minute")
+
+
+def format_results(results):
+    # Saved results from Database.get_analysis_results, one block per application
+    blocks = []
+    for application_id, company, position, status, result, error, completed_at in results:
+        outcome = result if status == 'done' else f"Failed: {error}"
+        blocks.append(f"{position} at {company} (application {application_id}):\n{outcome}")
+    return '\n\n'.join(blocks)
+
+
+def retry_delay(error, attempt, base_delay):
+    # Honour the server's Retry-After when it sends one, otherwise back off
+    # exponentially with jitter so parallel requests do not retry in lockstep.
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return min(float(retry_after), MAX_RETRY_DELAY_SECONDS)
+    except (TypeError, ValueError):
+        return min(base_delay * 2 ** attempt, MAX_RETRY_DELAY_SECONDS) * random.uniform(0.5, 1.0)
+
+
+async def compare_with_retry(chatbot, resume_text, application_text, report, max_retries, base_delay):
+    for attempt in range(max_retries + 1):
+        try:
+            return await chatbot.acompare_resume_application(resume_text, application_text)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_delay(e, attempt, base_delay)
+            report.retries += 1
+            logger.warning(f"{type(e).__name__} from the LLM, retrying in {delay:.1f}s",
+                           extra={'event': 'llm_retry', 'attempt': attempt + 1, 'delay': delay})
+            await asyncio.sleep(delay)
+
+
+async def analyze_applications(chatbot, db, user_id, resume_id, resume_text, application_ids=None,
+                               concurrency=None, max_retries=None, progress=None, is_cancelled=None):
+    # Compares one resume with many applications, at most `concurrency` LLM
+    # calls in flight. Each result is saved as soon as it arrives, and pairs
+    # that already have a result are skipped, so an interrupted run resumes
+    # where it stopped.
+    concurrency = concurrency or Config.BATCH_CONCURRENCY
+    max_retries = Config.BATCH_MAX_RETRIES if max_retries is None else max_retries
+    if application_ids is None:
+        application_ids = db.get_application_ids(user_id)
+    analyzed = db.get_analyzed_application_ids(user_id, resume_id)
+    pending = [application_id for application_id in application_ids if application_id not in analyzed]
+    report = BatchReport(len(pending), skipped=len(application_ids) - len(pending))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(application_id):
+        async with semaphore:
+            if is_cancelled and is_cancelled():
+                return
+            application_text = db.get_job_description(user_id, application_id)
+            if application_text is None:
+                report.total -= 1  # deleted since the run started
+                return
+            if not application_text:
+                application = db.get_application(user_id, application_id)
+                application_text = f"{application[3]} at {application[2]}"
+            try:
+                result = await compare_with_retry(chatbot, resume_text, application_text, report,
+                                                  max_retries, Config.BATCH_RETRY_BASE_SECONDS)
+                db.save_analysis_result(user_id, resume_id, application_id, 'done', result=result)
+                report.done += 1
+            except Exception as e:
+                logger.error(f"Batch analysis of application {application_id} failed: {str(e)}")
+                db.save_analysis_result(user_id, resume_id, application_id, 'error', error=str(e))
+                report.failed += 1
+            if progress:
+                progress(report)
+
+    await asyncio.gather(*(analyze(application_id) for application_id in pending))
+    logger.info(f"Batch analysis finished: {report.summary()}",
+                extra={'event': 'batch_analysis', 'done': report.done, 'failed': report.failed,
+                       'retries': report.retries, 'skipped': report.skipped})
+    return report
+
+
+def run_batch(chatbot, db, user_id, resume_id, resume_text, application_ids=None, concurrency=None,
+              max_retries=None, progress=None, is_cancelled=None):
+    # Synchronous entry point for executor jobs and the command line
+    return asyncio.run(analyze_applications(chatbot, db, user_id, resume_id, resume_text, application_ids,
+                                            concurrency, max_retries, progress, is_cancelled))
+
+
+def main(argv=None):
+    from ai_chat import AIChatBot
+    from modules.database import Database
+    from modules.resume_parser import get_or_extract_resume_text
+
+    parser = argparse.ArgumentParser(description="Compare one resume with many tracked applications")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--resume', required=True, help="Filename of an uploaded resume")
+    parser.add_argument('--application-id', type=int, action='append', dest='application_ids',
+                        help="Limit the run to these applications; defaults to all of them")
+    parser.add_argument('--concurrency', type=int, default=Config.BATCH_CONCURRENCY)
+    parser.add_argument('--max-retries', type=int, default=Config.BATCH_MAX_RETRIES)
+    args = parser.parse_args(argv)
+
+    db = Database()
+    user = db.get_user(args.username)
+    if not user:
+        print(f"Unknown user: {args.username}", file=sys.stderr)
+        return 1
+    resume_text = get_or_extract_resume_text(db, user[0], args.resume)
+    if not resume_text:
+        print(f"Unknown resume: {args.resume}", file=sys.stderr)
+        return 1
+
+    report = run_batch(AIChatBot(), db, user[0], resume_text[0], resume_text[1], args.application_ids,
+                       args.concurrency, args.max_retries,
+                       progress=lambda r: print(r.summary(), end='\r'))
+    print(report.summary())
+    # Including the applications skipped because an earlier run finished them
+    results = db.get_analysis_results(user[0], resume_text[0])
+    if results:
+        print()
+        print(format_results(results))
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
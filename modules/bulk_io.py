@@ -0,0 +1,161 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['company', 'position', 'job_description', 'contact_person', 'date']
+REQUIRED_FIELDS = ['company', 'position', 'date']
+# Spreadsheets export dates in whatever the locale prefers; store them as ISO dates
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d.%m.%Y', '%Y/%m/%d']
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+# The csv module rejects fields over 128 KB by default; long job descriptions
+# are normal. 2**31 - 1 also fits the C long on Windows.
+CSV_FIELD_LIMIT = 2 ** 31 - 1
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (line number, message)
+
+    def summary(self):
+        return f"Imported {self.inserted} applications, skipped {len(self.errors)} invalid rows"
+
+
+def detect_format(path, file_format=None):
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported file type '{extension}'; use .csv or .jsonl")
+    return FORMATS[extension]
+
+
+def normalize_key(key):
+    # "Job Description" and "job_description" refer to the same column
+    return (key or '').strip().lower().replace(' ', '_')
+
+
+def iter_rows(file, file_format, report):
+    # Lines that cannot be parsed into a row are recorded in the report and
+    # skipped, like rows that fail validation
+    if file_format == 'csv':
+        csv.field_size_limit(CSV_FIELD_LIMIT)
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, {normalize_key(key): value for key, value in row.items()}
+    else:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = {normalize_key(key): value for key, value in json.loads(line).items()}
+            except ValueError as e:
+                report.errors.append((line_number, f"Invalid JSON: {str(e)}"))
+                continue
+            except AttributeError:
+                report.errors.append((line_number, "Not a JSON object"))
+                continue
+            yield line_number, row
+
+
+def parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def validate_row(row):
+    values = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    missing = [field for field in REQUIRED_FIELDS if not values[field]]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    values['date'] = parse_date(values['date'])
+    return tuple(values[field] for field in FIELDS)
+
+
+def import_applications(db, user_id, path, file_format=None, batch_size=1000, progress=None):
+    # Streams the file and inserts valid rows in batches, one transaction per
+    # batch; progress(report) is called after every batch.
+    file_format = detect_format(path, file_format)
+    report = ImportReport()
+    batch = []
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        for line_number, row in iter_rows(file, file_format, report):
+            try:
+                batch.append(validate_row(row))
+            except (ValueError, TypeError, AttributeError) as e:
+                report.errors.append((line_number, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                db.add_applications(user_id, batch)
+                report.inserted += len(batch)
+                batch = []
+                if progress:
+                    progress(report)
+    if batch:
+        db.add_applications(user_id, batch)
+        report.inserted += len(batch)
+    if progress:
+        progress(report)
+    logger.info(f"{report.summary()} from {path}")
+    return report
+
+
+def export_applications(db, user_id, path, file_format=None):
+    file_format = detect_format(path, file_format)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+        for application in db.iter_applications(user_id):
+            values = application[2:7]  # company, position, job_description, contact_person, date
+            if file_format == 'csv':
+                writer.writerow(values)
+            else:
+                file.write(json.dumps(dict(zip(FIELDS, values))) + '\n')
+            count += 1
+    logger.info(f"Exported {count} applications to {path}")
+    return count
+
+
+def main(argv=None):
+    from modules.database import Database
+
+    parser = argparse.ArgumentParser(description="Import or export tracked job applications")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help="CSV or JSON Lines file")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    db = Database()
+    user = db.get_user(args.username)
+    if not user:
+        print(f"Unknown user: {args.username}", file=sys.stderr)
+        return 1
+
+    if args.command == 'import':
+        report = import_applications(db, user[0], args.path, args.format, args.batch_size,
+                                     progress=lambda r: print(f"{r.inserted} rows imported", end='\r'))
+        print(report.summary())
+        for line_number, message in report.errors:
+            print(f"  line {line_number}: {message}", file=sys.stderr)
+    else:
+        count = export_applications(db, user[0], args.path, args.format)
+        print(f"Exported {count} applications")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
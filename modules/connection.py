@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config import Config
+
+
+class ConnectionManager:
+    # One configured connection per database file, shared by every Database,
+    # the LLM cache and the background workers. SQLite connections are not
+    # safe for concurrent use, so all access goes through self.lock.
+    _managers = {}
+    _managers_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path=None):
+        path = path or Config.DATABASE_URI
+        with cls._managers_lock:
+            manager = cls._managers.get(path)
+            if manager is None:
+                manager = cls._managers[path] = cls(path)
+            return manager
+
+    @classmethod
+    def close_all(cls):
+        with cls._managers_lock:
+            for manager in cls._managers.values():
+                manager.conn.close()
+            cls._managers.clear()
+
+    def __init__(self, path):
+        self.path = path
+        # Autocommit mode: statements outside transaction() commit on their own,
+        # and transaction() issues BEGIN/COMMIT explicitly.
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        self._depth = 0
+        self.configure()
+
+    def configure(self):
+        # WAL lets readers proceed while a worker writes; with WAL, NORMAL
+        # synchronous only fsyncs at checkpoints instead of on every commit.
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute(f'PRAGMA cache_size = -{Config.SQLITE_CACHE_KB}')
+        self.conn.execute(f'PRAGMA busy_timeout = {Config.SQLITE_BUSY_TIMEOUT_MS}')
+        self.conn.execute('PRAGMA temp_store = MEMORY')
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls become savepoints, so helpers that write can be grouped
+        # into a caller's transaction and still roll back on their own.
+        with self.lock:
+            savepoint = f'sp_{self._depth}'
+            self.conn.execute('BEGIN IMMEDIATE' if self._depth == 0 else f'SAVEPOINT {savepoint}')
+            self._depth += 1
+            try:
+                yield self.conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute('ROLLBACK')
+                else:
+                    self.conn.execute(f'ROLLBACK TO {savepoint}')
+                    self.conn.execute(f'RELEASE {savepoint}')
+                raise
+            self._depth -= 1
+            self.conn.execute('COMMIT' if self._depth == 0 else f'RELEASE {savepoint}')
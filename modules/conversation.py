@@ -0,0 +1,97 @@
+import logging
+import threading
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from ai_chat import SYSTEM_PROMPT
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ROLE_NAMES = {'user': "User", 'assistant': "Chief"}
+
+
+class Conversation:
+    # A user's chat session, persisted in SQLite. Every prompt is the system
+    # prompt, the pinned resume/application condensed to a fixed budget, a
+    # running summary of older turns, and as many recent turns verbatim as fit
+    # in CHAT_HISTORY_TOKENS, so its size is bounded however long the
+    # conversation runs.
+    def __init__(self, db, chatbot, user_id):
+        self.db = db
+        self.chatbot = chatbot
+        self.user_id = user_id
+        self.pinned = {}  # kind -> document text
+        # One reply at a time, so each message sees the previous answer
+        self.lock = threading.Lock()
+        session = db.get_latest_chat_session(user_id)
+        if session:
+            self.session_id, self.summary, self.summarized_through = session
+        else:
+            self.new_session()
+
+    def new_session(self):
+        self.session_id = self.db.create_chat_session(self.user_id)
+        self.summary = None
+        self.summarized_through = 0
+
+    def pin(self, kind, text):
+        self.pinned[kind] = text
+
+    def recent_turns(self):
+        # (id, role, content, token_count) of every turn not yet summarised
+        return self.db.get_chat_messages(self.session_id, self.summarized_through)
+
+    def roll_up(self):
+        # Once the unsummarised turns overflow the history budget, the oldest
+        # are folded into the summary until the rest fill half of it; the
+        # summary is rewritten every few turns rather than on every message.
+        turns = self.recent_turns()
+        if sum(turn[3] for turn in turns) <= Config.CHAT_HISTORY_TOKENS:
+            return turns
+        split, kept_tokens = len(turns), 0
+        while split > 0 and kept_tokens + turns[split - 1][3] <= Config.CHAT_HISTORY_TOKENS // 2:
+            split -= 1
+            kept_tokens += turns[split][3]
+        self.summary = self.summarize(turns[:split])
+        self.summarized_through = turns[split - 1][0]
+        self.db.update_chat_summary(self.session_id, self.summary, self.summarized_through)
+        return turns[split:]
+
+    def summarize(self, turns):
+        transcript = "\n".join(f"{ROLE_NAMES[role]}: {content}" for _, role, content, _ in turns)
+        prompt = (f"Update the running summary of a conversation between a job seeker and Chief, their assistant. "
+                  f"Keep facts about the user, decisions and open questions in under {Config.CHAT_SUMMARY_TOKENS} tokens."
+                  f"\n\nSummary so far:\n{self.summary or '(none)'}\n\nNew turns:\n{transcript}")
+        summary = self.chatbot.complete(self.chatbot.build_messages(prompt))
+        return self.chatbot.truncate_text(summary, Config.CHAT_SUMMARY_TOKENS)
+
+    def build_messages(self, text):
+        turns = self.roll_up()
+        system_prompt = SYSTEM_PROMPT
+        for kind, document in self.pinned.items():
+            context = self.chatbot.condense(document, Config.CHAT_PINNED_TOKENS, kind)
+            system_prompt += f"\n\nThe user's {kind}:\n{context}"
+        if self.summary:
+            system_prompt += f"\n\nSummary of the conversation so far:\n{self.summary}"
+        messages = [SystemMessage(content=system_prompt)]
+        for _, role, content, _ in turns:
+            messages.append(HumanMessage(content=content) if role == 'user' else AIMessage(content=content))
+        messages.append(HumanMessage(content=text))
+        return messages
+
+    def reply(self, text, on_token=None):
+        with self.lock:
+            try:
+                text = self.chatbot.truncate_text(text, Config.CHAT_HISTORY_TOKENS // 2)
+                # With a resume or job description pinned, questions are about
+                # those documents, which canned answers know nothing about
+                response = None if self.pinned else self.chatbot.quick_reply(text, on_token)
+                if response is None:
+                    response = self.chatbot.complete(self.build_messages(text), on_token, use_cache=False)
+            except Exception as e:
+                logger.error(f"Error in conversation reply: {str(e)}")
+                return "I apologize, but I encountered an error while processing your message. Please try again later or contact support if the issue persists."
+            self.db.add_chat_messages(self.session_id, [
+                ('user', text, self.chatbot.count_tokens(text)),
+                ('assistant', response, self.chatbot.count_tokens(response)),
+            ])
+            return response
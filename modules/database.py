@@ -1,132 +1,530 @@
+import hashlib
+import re
 import sqlite3
-from config import Config
+import time
+import zlib
+from modules.connection import ConnectionManager
+from modules.migrations import migrate
+from modules.token_index import TokenizedText, build_token_index, try_build_token_index
+from modules.tracing import tracer
+
+# Explicit column list: databases upgraded by ALTER TABLE have the columns in a different order
+APPLICATION_COLUMNS = 'id, user_id, company, position, job_description, contact_person, date'
+
+GET_APPLICATIONS_SQL = f'SELECT {APPLICATION_COLUMNS} FROM applications WHERE user_id = ? ORDER BY date DESC'
+# Keyset pagination, newest first; the (user_id, date) index also carries the rowid
+GET_APPLICATIONS_PAGE_SQL = f'''
+    SELECT {APPLICATION_COLUMNS} FROM applications
+    WHERE user_id = ? AND (date, id) < (?, ?)
+    ORDER BY date DESC, id DESC
+    LIMIT ?
+'''
+# The application list only needs the columns it displays, not the job descriptions
+GET_APPLICATION_LIST_PAGE_SQL = '''
+    SELECT id, company, position, contact_person, date FROM applications
+    WHERE user_id = ? AND (date, id) < (?, ?)
+    ORDER BY date DESC, id DESC
+    LIMIT ?
+'''
+GET_APPLICATION_BY_COMPANY_POSITION_SQL = f'''
+    SELECT {APPLICATION_COLUMNS} FROM applications
+    WHERE user_id = ? AND company = ? AND position = ?
+    ORDER BY date DESC
+    LIMIT 1
+'''
+DELETE_APPLICATION_SQL = '''
+    DELETE FROM applications
+    WHERE user_id = ? AND company = ? AND position = ? AND date = ?
+'''
+GET_RESUMES_SQL = '''
+    SELECT resumes.id, resumes.filename, resumes.size, resumes.uploaded_at, resume_text.token_count
+    FROM resumes LEFT JOIN resume_text ON resume_text.resume_id = resumes.id
+    WHERE resumes.user_id = ?
+    ORDER BY resumes.filename
+'''
+GET_RESUME_BY_FILENAME_SQL = '''
+    SELECT id, filename, size, uploaded_at FROM resumes
+    WHERE user_id = ? AND filename = ?
+'''
+
+# bm25 has to score every matching row, so ranking is only used while the
+# match set is small; broad queries (a common word, the first letters typed)
+# list the newest matches instead, which FTS5 can stream in rowid order.
+RANKED_SEARCH_CANDIDATES = 2000
+# The user's matches and their scores, in one pass: up to one more than
+# RANKED_SEARCH_CANDIDATES tells a broad query from a rankable one. The FTS
+# index drives the join (CROSS JOIN keeps it as the outer loop; the planner
+# would otherwise run the MATCH once per application of the user), and each
+# match's owner is checked in idx_applications_id_user rather than in the
+# table's wide rows. bm25 column weights are for company, position,
+# job_description and contact_person.
+SCORE_APPLICATION_MATCHES_SQL = '''
+    SELECT applications_fts.rowid, bm25(applications_fts, 10.0, 5.0, 1.0, 2.0)
+    FROM applications_fts CROSS JOIN applications ON applications.id = applications_fts.rowid
+    WHERE applications_fts MATCH ? AND applications.user_id = ?
+    LIMIT ?
+'''
+# Newest matches first; only the rows returned are read from the table
+SEARCH_RECENT_APPLICATIONS_SQL = '''
+    SELECT applications.id, applications.company, applications.position, applications.contact_person,
+           applications.date
+    FROM (
+        SELECT applications_fts.rowid AS id
+        FROM applications_fts CROSS JOIN applications ON applications.id = applications_fts.rowid
+        WHERE applications_fts MATCH ? AND applications.user_id = ?
+        ORDER BY applications_fts.rowid DESC
+        LIMIT ?
+    ) AS matches CROSS JOIN applications ON applications.id = matches.id
+    ORDER BY matches.id DESC
+'''
+SEARCH_RESUMES_SQL = '''
+    SELECT matches.id, filename, size, uploaded_at, resume_text.token_count FROM (
+        SELECT resumes.id, resumes.filename, resumes.size, resumes.uploaded_at,
+               bm25(resume_text_fts) AS score
+        FROM resume_text_fts JOIN resumes ON resumes.id = resume_text_fts.rowid
+        WHERE resume_text_fts MATCH ? AND resumes.user_id = ?
+        UNION
+        SELECT id, filename, size, uploaded_at, -1000.0 AS score FROM resumes
+        WHERE user_id = ? AND filename LIKE ? ESCAPE '\\'
+    ) AS matches
+    LEFT JOIN resume_text ON resume_text.resume_id = matches.id
+    GROUP BY matches.id
+    ORDER BY MIN(score)
+    LIMIT ?
+'''
+
+
+def build_fts_query(text):
+    # Every word the user typed must match, each as a prefix so results
+    # narrow while they are still typing. Quoting keeps FTS5 operators and
+    # punctuation in user input from being parsed as query syntax. Single
+    # letters match whole words only; there is no one-character prefix index.
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words) or None
+
+
+# Queries that must be answered from an index; see Database.check_query_plans
+HOT_QUERIES = {
+    'get_applications': (GET_APPLICATIONS_SQL, (1,)),
+    'get_applications_page': (GET_APPLICATIONS_PAGE_SQL, (1, '9999-12-31', 0, 100)),
+    'get_application_list_page': (GET_APPLICATION_LIST_PAGE_SQL, (1, '9999-12-31', 0, 100)),
+    'get_application_by_company_position': (GET_APPLICATION_BY_COMPANY_POSITION_SQL, (1, '', '')),
+    'delete_application': (DELETE_APPLICATION_SQL, (1, '', '', '')),
+    'get_resumes': (GET_RESUMES_SQL, (1,)),
+    'get_resume_by_filename': (GET_RESUME_BY_FILENAME_SQL, (1, '')),
+}
 
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(Config.DATABASE_URI)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
-        self.check_and_update_schema()
-
-    def create_tables(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL
-            )
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS resumes (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER,
-                filename TEXT NOT NULL,
-                content BLOB,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER,
-                company TEXT NOT NULL,
-                position TEXT NOT NULL,
-                job_description TEXT,
-                contact_person TEXT,
-                date TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        self.conn.commit()
-
-    def check_and_update_schema(self):
-        # Check if job_description column exists in applications table
-        self.cursor.execute("PRAGMA table_info(applications)")
-        columns = [column[1] for column in self.cursor.fetchall()]
-
-        if 'job_description' not in columns:
-            print("Adding job_description column to applications table")
-            self.cursor.execute("ALTER TABLE applications ADD COLUMN job_description TEXT")
-            self.conn.commit()
+    def __init__(self, path=None):
+        self.manager = ConnectionManager.get(path)
+        self.conn = self.manager.conn
+        self.lock = self.manager.lock
+        migrate(self)
+
+    def transaction(self):
+        return self.manager.transaction()
+
+    # Each statement is timed under a span named after its verb and first
+    # table, e.g. db.select.applications; time spent waiting for the lock is
+    # not included.
+    def execute(self, sql, params=()):
+        with self.lock, tracer.sql_span(sql):
+            return self.conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        with self.lock, tracer.sql_span(sql):
+            return self.conn.executemany(sql, rows)
+
+    def fetchone(self, sql, params=()):
+        with self.lock, tracer.sql_span(sql):
+            return self.conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with self.lock, tracer.sql_span(sql):
+            return self.conn.execute(sql, params).fetchall()
+
+    def explain_query_plan(self, sql, params=()):
+        return [row[3] for row in self.fetchall(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+    def check_query_plans(self):
+        # Returns {query name: plan} for every hot query that scans a whole
+        # table or sorts in a temporary b-tree; empty when all use an index.
+        problems = {}
+        for name, (sql, params) in HOT_QUERIES.items():
+            plan = self.explain_query_plan(sql, params)
+            if any(step.startswith('SCAN') or 'TEMP B-TREE' in step for step in plan):
+                problems[name] = plan
+        return problems
+
+    def vacuum(self):
+        self.execute('VACUUM')
+
     def close(self):
-        self.conn.close()
+        # The connection is shared; only close it when the application exits
+        ConnectionManager.close_all()
 
     def add_user(self, username, password, role='user'):
-        self.cursor.execute('''
-            INSERT INTO users (username, password, role)
-            VALUES (?, ?, ?)
-        ''', (username, password, role))
-        self.conn.commit()
+        with self.transaction():
+            self.execute('''
+                INSERT INTO users (username, password, role)
+                VALUES (?, ?, ?)
+            ''', (username, password, role))
 
     def get_user(self, username):
-        self.cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        return self.cursor.fetchone()
+        return self.fetchone('SELECT * FROM users WHERE username = ?', (username,))
 
     def get_user_by_id(self, user_id):
-        self.cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        return self.cursor.fetchone()
+        return self.fetchone('SELECT * FROM users WHERE id = ?', (user_id,))
 
     def update_user_password(self, user_id, new_password):
-        self.cursor.execute('UPDATE users SET password = ? WHERE id = ?', (new_password, user_id))
-        self.conn.commit()
+        with self.transaction():
+            self.execute('UPDATE users SET password = ? WHERE id = ?', (new_password, user_id))
 
     def delete_user(self, user_id):
-        self.cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
-        self.conn.commit()
+        with self.transaction():
+            self.execute('DELETE FROM users WHERE id = ?', (user_id,))
+
+    def get_setting(self, key, default=None):
+        row = self.fetchone('SELECT value FROM settings WHERE key = ?', (key,))
+        return row[0] if row else default
+
+    def set_setting(self, key, value):
+        with self.transaction():
+            self.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def store_blob(self, content):
+        sha256 = hashlib.sha256(content).hexdigest()
+        with self.transaction():
+            cursor = self.execute('UPDATE resume_blobs SET ref_count = ref_count + 1 WHERE sha256 = ?', (sha256,))
+            if cursor.rowcount == 0:
+                self.execute('''
+                    INSERT INTO resume_blobs (sha256, content, size, compression, ref_count)
+                    VALUES (?, ?, ?, 'zlib', 1)
+                ''', (sha256, zlib.compress(content, 6), len(content)))
+        return sha256
+
+    def release_blobs(self, user_id, filename):
+        with self.transaction():
+            self.execute('''
+                UPDATE resume_blobs SET ref_count = ref_count - (
+                    SELECT COUNT(*) FROM resumes
+                    WHERE user_id = ? AND filename = ? AND blob_sha256 = resume_blobs.sha256
+                )
+                WHERE sha256 IN (SELECT blob_sha256 FROM resumes WHERE user_id = ? AND filename = ?)
+            ''', (user_id, filename, user_id, filename))
+            self.execute('DELETE FROM resume_blobs WHERE ref_count <= 0')
 
     def add_resume(self, user_id, filename, content):
-        self.cursor.execute('''
-            INSERT INTO resumes (user_id, filename, content)
-            VALUES (?, ?, ?)
-        ''', (user_id, filename, content))
-        self.conn.commit()
+        with self.transaction():
+            sha256 = self.store_blob(content)
+            cursor = self.execute('''
+                INSERT INTO resumes (user_id, filename, size, uploaded_at, blob_sha256)
+                VALUES (?, ?, ?, datetime('now'), ?)
+            ''', (user_id, filename, len(content), sha256))
+            return cursor.lastrowid
+
+    def save_resume_text(self, resume_id, text, page_count, token_count, token_offsets=None):
+        with self.transaction():
+            # An upsert rather than INSERT OR REPLACE, which would bypass the
+            # full-text index's delete trigger
+            self.execute('''
+                INSERT INTO resume_text (resume_id, text, page_count, token_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (resume_id) DO UPDATE SET
+                    text = excluded.text, page_count = excluded.page_count, token_count = excluded.token_count
+            ''', (resume_id, text, page_count, token_count))
+            if token_offsets is not None:
+                self.save_token_index('resume', resume_id, token_count, token_offsets)
+
+    def save_token_index(self, document_type, document_id, token_count, token_offsets):
+        self.execute('''
+            INSERT OR REPLACE INTO token_index (document_type, document_id, token_count, offsets)
+            VALUES (?, ?, ?, ?)
+        ''', (document_type, document_id, token_count, token_offsets))
+
+    def search_applications(self, user_id, text, limit=200):
+        query = build_fts_query(text)
+        if query is None:
+            return []
+        scores = self.fetchall(SCORE_APPLICATION_MATCHES_SQL, (query, user_id, RANKED_SEARCH_CANDIDATES + 1))
+        if len(scores) > RANKED_SEARCH_CANDIDATES:
+            return self.fetchall(SEARCH_RECENT_APPLICATIONS_SQL, (query, user_id, limit))
+        application_ids = [application_id for application_id, _ in sorted(scores, key=lambda row: row[1])[:limit]]
+        placeholders = ', '.join('?' * len(application_ids))
+        rows = {row[0]: row for row in self.fetchall(f'''
+            SELECT id, company, position, contact_person, date FROM applications WHERE id IN ({placeholders})
+        ''', application_ids)}
+        return [rows[application_id] for application_id in application_ids]
+
+    def search_resumes(self, user_id, text, limit=100):
+        query = build_fts_query(text)
+        if query is None:
+            return []
+        pattern = '%' + re.sub(r'([%_\\])', r'\\\1', text.strip()) + '%'
+        return self.fetchall(SEARCH_RESUMES_SQL, (query, user_id, user_id, pattern, limit))
+
+    def search(self, user_id, text, limit=100):
+        # Ranked matches across applications and extracted resume text
+        return {
+            'applications': self.search_applications(user_id, text, limit),
+            'resumes': self.search_resumes(user_id, text, limit),
+        }
+
+    def get_resume_text(self, user_id, filename):
+        # The text comes back as a TokenizedText when its token index is stored
+        row = self.fetchone('''
+            SELECT resume_text.resume_id, resume_text.text, resume_text.page_count, resume_text.token_count,
+                   token_index.offsets
+            FROM resumes JOIN resume_text ON resume_text.resume_id = resumes.id
+            LEFT JOIN token_index ON token_index.document_type = 'resume'
+                AND token_index.document_id = resume_text.resume_id
+            WHERE resumes.user_id = ? AND resumes.filename = ?
+        ''', (user_id, filename))
+        if row is None:
+            return None
+        resume_id, text, page_count, token_count, offsets = row
+        if offsets is not None:
+            text = TokenizedText(text, token_count, offsets)
+        return resume_id, text, page_count, token_count
 
     def get_resumes(self, user_id):
-        self.cursor.execute('SELECT * FROM resumes WHERE user_id = ?', (user_id,))
-        return self.cursor.fetchall()
+        # Metadata only; use get_resume_content/iter_resume_content for the file itself
+        return self.fetchall(GET_RESUMES_SQL, (user_id,))
 
     def get_resume_by_filename(self, user_id, filename):
-        self.cursor.execute('SELECT * FROM resumes WHERE user_id = ? AND filename = ?', (user_id, filename))
-        return self.cursor.fetchone()
+        return self.fetchone(GET_RESUME_BY_FILENAME_SQL, (user_id, filename))
+
+    def iter_blob(self, table, column, rowid, chunk_size):
+        # Stream the blob with SQLite incremental I/O rather than materialising it in one query
+        with self.lock:
+            try:
+                blob = self.conn.blobopen(table, column, rowid, readonly=True)
+            except (AttributeError, sqlite3.OperationalError):
+                # Python < 3.11 has no blobopen; NULL content cannot be opened as a blob
+                row = self.fetchone(f'SELECT {column} FROM {table} WHERE rowid = ?', (rowid,))
+                if row and row[0] is not None:
+                    yield row[0] if isinstance(row[0], bytes) else row[0].encode('utf-8')
+                return
+            with blob:
+                while True:
+                    chunk = blob.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+    def iter_resume_content(self, resume_id, chunk_size=65536):
+        row = self.fetchone('''
+            SELECT resume_blobs.rowid FROM resumes
+            JOIN resume_blobs ON resume_blobs.sha256 = resumes.blob_sha256
+            WHERE resumes.id = ?
+        ''', (resume_id,))
+        if row is None:
+            # Rows written before the blob store keep their content inline
+            yield from self.iter_blob('resumes', 'content', resume_id, chunk_size)
+            return
+        decompressor = zlib.decompressobj()
+        for chunk in self.iter_blob('resume_blobs', 'content', row[0], chunk_size):
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    def get_resume_content(self, resume_id):
+        with tracer.span('db.read_resume_content'):
+            content = b"".join(self.iter_resume_content(resume_id))
+        tracer.count('db.resume_bytes_read', len(content))
+        return content
 
     def delete_resume(self, user_id, filename):
-        self.cursor.execute('DELETE FROM resumes WHERE user_id = ? AND filename = ?', (user_id, filename))
-        self.conn.commit()
+        with self.transaction():
+            self.release_blobs(user_id, filename)
+            self.execute('''
+                DELETE FROM resume_text WHERE resume_id IN (
+                    SELECT id FROM resumes WHERE user_id = ? AND filename = ?
+                )
+            ''', (user_id, filename))
+            self.execute('DELETE FROM resumes WHERE user_id = ? AND filename = ?', (user_id, filename))
 
     def add_application(self, user_id, company, position, job_description, contact_person, date):
-        self.cursor.execute('''
+        # Not tokenized here: this runs on the GUI thread, so the caller
+        # follows up with index_applications in a background job
+        cursor = self.execute('''
             INSERT INTO applications (user_id, company, position, job_description, contact_person, date)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (user_id, company, position, job_description, contact_person, date))
-        self.conn.commit()
+        return cursor.lastrowid
+
+    def add_applications(self, user_id, applications):
+        # applications: iterable of (company, position, job_description, contact_person, date)
+        with self.transaction():
+            self.executemany('''
+                INSERT INTO applications (user_id, company, position, job_description, contact_person, date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', ((user_id, *application) for application in applications))
+
+    def index_applications(self, user_id, batch_size=500):
+        # Builds the token index of every application of the user that has
+        # none yet; run in a background job after adding or importing
+        # applications. Returns the number indexed.
+        indexed = 0
+        last_id = 0
+        while True:
+            rows = self.fetchall('''
+                SELECT applications.id, applications.job_description FROM applications
+                LEFT JOIN token_index ON token_index.document_type = 'application'
+                    AND token_index.document_id = applications.id
+                WHERE applications.user_id = ? AND applications.id > ? AND token_index.document_id IS NULL
+                ORDER BY applications.id
+                LIMIT ?
+            ''', (user_id, last_id, batch_size))
+            if not rows:
+                return indexed
+            indexes = [(application_id, *build_token_index(job_description or ''))
+                       for application_id, job_description in rows]
+            with self.transaction():
+                for application_id, token_count, offsets in indexes:
+                    self.save_token_index('application', application_id, token_count, offsets)
+            indexed += len(rows)
+            last_id = rows[-1][0]
 
     def get_applications(self, user_id):
-        self.cursor.execute('SELECT * FROM applications WHERE user_id = ?', (user_id,))
-        return self.cursor.fetchall()
+        return self.fetchall(GET_APPLICATIONS_SQL, (user_id,))
+
+    def get_applications_page(self, user_id, after=None, limit=100):
+        # after is the (date, id) of the last row of the previous page
+        after_date, after_id = after or ('\uffff', 0)
+        return self.fetchall(GET_APPLICATIONS_PAGE_SQL, (user_id, after_date, after_id, limit))
+
+    def get_application_list_page(self, user_id, after=None, limit=100):
+        after_date, after_id = after or ('\uffff', 0)
+        return self.fetchall(GET_APPLICATION_LIST_PAGE_SQL, (user_id, after_date, after_id, limit))
+
+    def get_application_list_row(self, user_id, application_id):
+        return self.fetchone('''
+            SELECT id, company, position, contact_person, date FROM applications
+            WHERE id = ? AND user_id = ?
+        ''', (application_id, user_id))
+
+    def get_application(self, user_id, application_id):
+        return self.fetchone(f'SELECT {APPLICATION_COLUMNS} FROM applications WHERE id = ? AND user_id = ?',
+                             (application_id, user_id))
+
+    def get_job_description(self, user_id, application_id, build_index=True):
+        # As a TokenizedText. An application index_applications has not reached
+        # yet is indexed here, unless build_index is False; either way, without
+        # a token index the plain text is returned.
+        row = self.fetchone('''
+            SELECT applications.job_description, token_index.token_count, token_index.offsets
+            FROM applications LEFT JOIN token_index ON token_index.document_type = 'application'
+                AND token_index.document_id = applications.id
+            WHERE applications.id = ? AND applications.user_id = ?
+        ''', (application_id, user_id))
+        if row is None:
+            return None
+        job_description, token_count, offsets = row
+        job_description = job_description or ''
+        if offsets is None:
+            if not build_index:
+                return job_description
+            token_count, offsets = try_build_token_index(job_description, f"job description {application_id}")
+            if offsets is None:
+                return job_description
+            with self.transaction():
+                self.save_token_index('application', application_id, token_count, offsets)
+        return TokenizedText(job_description, token_count, offsets)
+
+    def get_application_ids(self, user_id):
+        return [row[0] for row in self.fetchall('SELECT id FROM applications WHERE user_id = ?', (user_id,))]
+
+    def get_application_texts(self, user_id, application_ids, chunk_size=500):
+        # (id, company, position, job_description) for the given ids
+        application_ids = list(application_ids)
+        rows = []
+        for start in range(0, len(application_ids), chunk_size):
+            chunk = application_ids[start:start + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(self.fetchall(f'''
+                SELECT id, company, position, job_description FROM applications
+                WHERE user_id = ? AND id IN ({placeholders})
+            ''', (user_id, *chunk)))
+        return rows
+
+    def iter_applications(self, user_id, page_size=500):
+        # Streams every application page by page, releasing the connection in between
+        after = None
+        while True:
+            page = self.get_applications_page(user_id, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                break
+            after = (page[-1][6], page[-1][0])
 
     def get_application_by_company_position(self, user_id, company, position):
-        self.cursor.execute("""
-            SELECT * FROM applications
-            WHERE user_id = ? AND company = ? AND position = ?
-            ORDER BY date DESC
-            LIMIT 1
-        """, (user_id, company, position))
-        return self.cursor.fetchone()
+        return self.fetchone(GET_APPLICATION_BY_COMPANY_POSITION_SQL, (user_id, company, position))
 
     def delete_application(self, user_id, company, position, date):
-        self.cursor.execute('''
-            DELETE FROM applications 
-            WHERE user_id = ? AND company = ? AND position = ? AND date = ?
-        ''', (user_id, company, position, date))
-        self.conn.commit()
-
-        def get_application_by_company_position(self, user_id, company, position):
-            self.cursor.execute("""
-                SELECT * FROM applications
-                WHERE user_id = ? AND company = ? AND position = ?
-                ORDER BY date DESC
-                LIMIT 1
-            """, (user_id, company, position))
-            return self.cursor.fetchone()
\ No newline at end of file
+        with self.transaction():
+            self.execute(DELETE_APPLICATION_SQL, (user_id, company, position, date))
+
+    def delete_application_by_id(self, user_id, application_id):
+        with self.transaction():
+            # Its analysis results go with it, by trigger
+            self.execute('DELETE FROM applications WHERE id = ? AND user_id = ?', (application_id, user_id))
+
+    def save_analysis_result(self, user_id, resume_id, application_id, status, result=None, error=None):
+        with self.transaction():
+            self.execute('''
+                INSERT INTO analysis_results (user_id, resume_id, application_id, status, result, error, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (resume_id, application_id) DO UPDATE SET
+                    status = excluded.status, result = excluded.result, error = excluded.error,
+                    completed_at = excluded.completed_at
+            ''', (user_id, resume_id, application_id, status, result, error, time.time()))
+
+    def get_analysis_results(self, user_id, resume_id):
+        # (application_id, company, position, status, result, error, completed_at)
+        return self.fetchall('''
+            SELECT analysis_results.application_id, applications.company, applications.position,
+                   analysis_results.status, analysis_results.result, analysis_results.error,
+                   analysis_results.completed_at
+            FROM analysis_results JOIN applications ON applications.id = analysis_results.application_id
+            WHERE analysis_results.user_id = ? AND analysis_results.resume_id = ?
+            ORDER BY analysis_results.completed_at
+        ''', (user_id, resume_id))
+
+    def get_analyzed_application_ids(self, user_id, resume_id):
+        # Applications that already have a successful result for this resume
+        return {row[0] for row in self.fetchall('''
+            SELECT application_id FROM analysis_results WHERE user_id = ? AND resume_id = ? AND status = 'done'
+        ''', (user_id, resume_id))}
+
+    def create_chat_session(self, user_id):
+        with self.transaction():
+            cursor = self.execute('INSERT INTO chat_sessions (user_id, created_at) VALUES (?, ?)',
+                                  (user_id, time.time()))
+            return cursor.lastrowid
+
+    def get_latest_chat_session(self, user_id):
+        return self.fetchone('''
+            SELECT id, summary, summarized_through FROM chat_sessions
+            WHERE user_id = ? ORDER BY id DESC LIMIT 1
+        ''', (user_id,))
+
+    def add_chat_messages(self, session_id, messages):
+        # messages: iterable of (role, content, token_count), saved together
+        now = time.time()
+        with self.transaction():
+            self.executemany('''
+                INSERT INTO chat_messages (session_id, role, content, token_count, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(session_id, role, content, token_count, now) for role, content, token_count in messages])
+
+    def get_chat_messages(self, session_id, after_id=0):
+        return self.fetchall('''
+            SELECT id, role, content, token_count FROM chat_messages
+            WHERE session_id = ? AND id > ? ORDER BY id
+        ''', (session_id, after_id))
+
+    def update_chat_summary(self, session_id, summary, summarized_through):
+        with self.transaction():
+            self.execute('UPDATE chat_sessions SET summary = ?, summarized_through = ? WHERE id = ?',
+                         (summary, summarized_through, session_id))
@@ -0,0 +1,104 @@
+import json
+import logging
+import math
+import os
+import random
+import re
+from collections import Counter, defaultdict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+INTENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'intents.json')
+NON_WORD = re.compile(r"[^a-z0-9 ]+")
+# Longer messages are real questions for the LLM, whatever they start with
+MAX_INTENT_WORDS = 8
+# Only small talk is answered locally; canned advice on resumes or job search
+# would override the LLM's answer grounded in the user's own documents
+SMALL_TALK_INTENTS = ('greeting', 'thanks', 'goodbye')
+# "no thanks" or "not helpful" is not thanks; apostrophes are already stripped
+NEGATIONS = {'no', 'not', 'nope', 'never', 'nothing', 'dont', 'doesnt', 'didnt', 'isnt', 'wasnt', 'cant', 'wont'}
+
+
+def normalize(text):
+    text = NON_WORD.sub(' ', text.lower().replace("'", ''))
+    return ' '.join(text.split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IntentClassifier:
+    # Answers small talk from intents.json without an API call. An exact match
+    # on the normalised pattern is found by dictionary lookup; otherwise the
+    # message is scored against every pattern by cosine similarity of their
+    # character trigram sets, through an inverted index.
+    def __init__(self, path=None, min_score=None, tags=SMALL_TALK_INTENTS):
+        self.min_score = Config.INTENT_MIN_SCORE if min_score is None else min_score
+        self.tags = tags
+        self.responses = {}  # tag -> responses
+        self.exact = {}  # normalised pattern -> tag
+        self.patterns = []  # (tag, trigram count)
+        self.index = defaultdict(list)  # trigram -> pattern numbers
+        self.lookups = 0
+        self.hits = Counter()
+        self.load(path or INTENTS_PATH)
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                intents = json.load(file)['intents']
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load intents from {path}: {str(e)}")
+            return
+        for intent in intents:
+            if intent['tag'] not in self.tags:
+                continue
+            self.responses[intent['tag']] = intent['responses']
+            for pattern in intent['patterns']:
+                normalized = normalize(pattern)
+                self.exact[normalized] = intent['tag']
+                grams = trigrams(normalized)
+                for gram in grams:
+                    self.index[gram].append(len(self.patterns))
+                self.patterns.append((intent['tag'], len(grams)))
+
+    def classify(self, text):
+        # (tag, score) of the best matching intent, or None below min_score
+        normalized = normalize(text)
+        words = normalized.split()
+        if not words or len(words) > MAX_INTENT_WORDS or NEGATIONS.intersection(words):
+            return None
+        if normalized in self.exact:
+            return self.exact[normalized], 1.0
+        grams = trigrams(normalized)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.index.get(gram, ()))
+        best = None
+        for number, count in shared.items():
+            tag, pattern_size = self.patterns[number]
+            score = count / math.sqrt(len(grams) * pattern_size)
+            if best is None or score > best[1]:
+                best = (tag, score)
+        return best if best and best[1] >= self.min_score else None
+
+    def respond(self, text):
+        self.lookups += 1
+        match = self.classify(text)
+        if match is None:
+            return None
+        self.hits[match[0]] += 1
+        return random.choice(self.responses[match[0]])
+
+    def stats(self):
+        hits = sum(self.hits.values())
+        return {
+            'lookups': self.lookups,
+            'hits': hits,
+            'hit_rate': hits / self.lookups if self.lookups else 0.0,
+            'api_calls_saved': hits,
+            'hits_by_intent': dict(self.hits),
+        }
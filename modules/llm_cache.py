@@ -0,0 +1,69 @@
+import hashlib
+import json
+import time
+from config import Config
+from modules.connection import ConnectionManager
+
+
+class ResponseCache:
+    def __init__(self, db_path=None, max_entries=None, ttl_seconds=None):
+        # The cache runs on the executor's worker threads and shares the
+        # application's connection; the llm_cache table itself is created by
+        # the database migrations.
+        self.manager = ConnectionManager.get(db_path)
+        self.conn = self.manager.conn
+        self.lock = self.manager.lock
+        self.max_entries = max_entries or Config.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.LLM_CACHE_TTL_SECONDS
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model, temperature, messages):
+        payload = json.dumps([model, temperature, [(message.type, message.content) for message in messages]])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] < now - self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.conn.execute('UPDATE llm_cache SET last_accessed = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self.manager.transaction():
+            self.conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, model, response, now, now))
+            self.evict(now)
+
+    def evict(self, now):
+        # Drop expired entries first, then the least recently used ones until
+        # the cache is back under its size limit.
+        self.conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+        self.conn.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM llm_cache')
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
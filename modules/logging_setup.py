@@ -0,0 +1,96 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from config import Config
+
+# Third-party loggers that flood DEBUG with connection and certificate chatter
+QUIET_LOGGERS = ['urllib3', 'httpx', 'httpcore', 'openai', 'langchain', 'langchain_core', 'certifi', 'asyncio',
+                 'PyPDF2', 'comtypes']
+# Attributes every LogRecord has; anything else was passed through extra=
+STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line; fields passed with extra={...} are included,
+    # so events can be filtered and aggregated without parsing messages.
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    # Keeps the caller's work to building the message; formatting to JSON and
+    # all file I/O happen on the listener thread.
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def gzip_rotator(source, destination):
+    with open(source, 'rb') as log_file, gzip.open(destination, 'wb') as compressed:
+        shutil.copyfileobj(log_file, compressed)
+    os.remove(source)
+
+
+def parse_levels(spec):
+    # "modules.database=DEBUG,httpx=INFO" -> {'modules.database': 'DEBUG', 'httpx': 'INFO'}
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def stop_logging(listener):
+    # Flushes whatever is still queued; safe to call more than once
+    if listener._thread is not None:
+        listener.stop()
+
+
+def setup_logging(log_file=None):
+    # Returns the started QueueListener; it is also stopped at exit.
+    file_handler = logging.handlers.RotatingFileHandler(log_file or Config.LOG_FILE, maxBytes=Config.LOG_MAX_BYTES,
+                                                        backupCount=Config.LOG_BACKUP_COUNT, encoding='utf-8')
+    file_handler.namer = lambda name: name + '.gz'
+    file_handler.rotator = gzip_rotator
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(Config.LOG_CONSOLE_LEVEL)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers = [LogQueueHandler(log_queue)]
+    root.setLevel(Config.LOG_LEVEL)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    for name, level in parse_levels(Config.LOG_LEVELS).items():
+        logging.getLogger(None if name == 'root' else name).setLevel(level)
+    listener.start()
+    atexit.register(stop_logging, listener)
+    return listener
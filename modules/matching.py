@@ -0,0 +1,109 @@
+import hashlib
+import math
+import re
+import threading
+import zlib
+import numpy as np
+from scipy import sparse
+
+# Hashed unigram + bigram features: no vocabulary to build or store, and a
+# new application can be vectorised without touching any other row.
+N_FEATURES = 2 ** 20
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")  # keeps c++, c#, node.js
+
+
+def tokenize(text):
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def hash_vector(text):
+    # Sublinear term frequencies, keyed by a stable hash of each feature
+    counts = {}
+    for feature in tokenize(text):
+        index = zlib.crc32(feature.encode('utf-8')) % N_FEATURES
+        counts[index] = counts.get(index, 0) + 1
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter((1.0 + math.log(count) for count in counts.values()), dtype=np.float64, count=len(counts))
+    return indices, values
+
+
+def to_matrix(vectors):
+    # Stack (indices, values) pairs into one CSR matrix, one row per vector
+    indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+    for row, (indices, _) in enumerate(vectors):
+        indptr[row + 1] = indptr[row] + len(indices)
+    indices = np.concatenate([vector[0] for vector in vectors]) if vectors else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([vector[1] for vector in vectors]) if vectors else np.zeros(0)
+    return sparse.csr_matrix((values, indices, indptr), shape=(len(vectors), N_FEATURES))
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+class MatchIndex:
+    # TF-IDF cosine similarity between resumes and every tracked application
+    # of one user. Application vectors are cached by id: applications are only
+    # ever inserted or deleted and ids are never reused, so comparing id sets
+    # finds every change and only new rows are read and vectorised.
+    def __init__(self, db, user_id):
+        self.db = db
+        self.user_id = user_id
+        self.vectors = {}  # application id -> (indices, values)
+        self.resume_vectors = {}  # resume text digest -> (indices, values)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = None
+        self.idf = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        current_ids = set(self.db.get_application_ids(self.user_id))
+        added = current_ids - self.vectors.keys()
+        removed = self.vectors.keys() - current_ids
+        for application_id in removed:
+            del self.vectors[application_id]
+        for application_id, company, position, job_description in self.db.get_application_texts(self.user_id, added):
+            self.vectors[application_id] = hash_vector(f"{company} {position} {job_description or ''}")
+        if added or removed or self.matrix is None:
+            self.rebuild()
+
+    def rebuild(self):
+        self.ids = np.fromiter(self.vectors.keys(), dtype=np.int64, count=len(self.vectors))
+        counts = to_matrix(list(self.vectors.values()))
+        document_frequency = np.bincount(counts.indices, minlength=N_FEATURES)
+        self.idf = np.log((1.0 + len(self.ids)) / (1.0 + document_frequency)) + 1.0
+        self.matrix = normalize_rows(counts @ sparse.diags(self.idf))
+
+    def resume_matrix(self, resume_texts):
+        vectors = []
+        for text in resume_texts:
+            digest = hashlib.sha1(text.encode('utf-8')).digest()
+            if digest not in self.resume_vectors:
+                self.resume_vectors[digest] = hash_vector(text)
+            vectors.append(self.resume_vectors[digest])
+        return normalize_rows(to_matrix(vectors) @ sparse.diags(self.idf))
+
+    def rank_many(self, resume_texts, top_k=10):
+        # One sparse product scores every resume against every application;
+        # returns, per resume, the top_k (application id, score) pairs.
+        with self.lock:
+            self.refresh()
+            if not len(self.ids):
+                return [[] for _ in resume_texts]
+            # applications x resumes keeps the large matrix in CSR order, so
+            # scipy never has to transpose a copy of it per call
+            scores = (self.matrix @ self.resume_matrix(resume_texts).T.tocsc()).toarray()
+            ids = self.ids
+        results = []
+        k = min(top_k, len(ids))
+        for row in scores.T:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(int(ids[i]), float(row[i])) for i in top])
+        return results
+
+    def rank(self, resume_text, top_k=10):
+        return self.rank_many([resume_text], top_k)[0]
@@ -0,0 +1,375 @@
+import hashlib
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes for the hot per-user queries
+INDEXES = {
+    'idx_applications_user_date': 'applications (user_id, date)',
+    'idx_applications_user_company_position_date': 'applications (user_id, company, position, date)',
+    'idx_resumes_user_filename': 'resumes (user_id, filename)',
+}
+
+
+def get_columns(db, table):
+    return [column[1] for column in db.fetchall(f"PRAGMA table_info({table})")]
+
+
+def add_column_if_missing(db, table, column, declaration):
+    # Databases created before the migration runner existed may already have
+    # some of these columns, so every migration has to tolerate that.
+    if column in get_columns(db, table):
+        return False
+    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    return True
+
+
+def create_base_tables(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS resumes (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            filename TEXT NOT NULL,
+            content BLOB,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS applications (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            company TEXT NOT NULL,
+            position TEXT NOT NULL,
+            job_description TEXT,
+            contact_person TEXT,
+            date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    add_column_if_missing(db, 'applications', 'job_description', 'TEXT')
+    add_column_if_missing(db, 'applications', 'contact_person', 'TEXT')
+
+
+def create_resume_text(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS resume_text (
+            resume_id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL,
+            page_count INTEGER,
+            token_count INTEGER,
+            FOREIGN KEY (resume_id) REFERENCES resumes (id)
+        )
+    ''')
+
+
+def add_resume_metadata(db):
+    # Resume listings read size and upload time instead of the content blob
+    add_column_if_missing(db, 'resumes', 'uploaded_at', 'TEXT')
+    if add_column_if_missing(db, 'resumes', 'size', 'INTEGER'):
+        db.execute("UPDATE resumes SET size = length(content)")
+
+
+def create_resume_blobs(db):
+    # Resume files are stored once per distinct content, compressed, and
+    # shared by every resumes row that references them.
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS resume_blobs (
+            sha256 TEXT PRIMARY KEY,
+            content BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            compression TEXT NOT NULL,
+            ref_count INTEGER NOT NULL
+        )
+    ''')
+    add_column_if_missing(db, 'resumes', 'blob_sha256', 'TEXT')
+
+    # Written against the schema as it was at this version rather than
+    # Database's blob helpers, which may change later. One file at a time, so
+    # only one resume is in memory.
+    rows = db.fetchall('SELECT id FROM resumes WHERE content IS NOT NULL AND blob_sha256 IS NULL')
+    resume_ids = [row[0] for row in rows]
+    for resume_id in resume_ids:
+        content = db.fetchone('SELECT content FROM resumes WHERE id = ?', (resume_id,))[0]
+        # Older databases declare content TEXT, and may hold str values there
+        content = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+        sha256 = hashlib.sha256(content).hexdigest()
+        cursor = db.execute('UPDATE resume_blobs SET ref_count = ref_count + 1 WHERE sha256 = ?', (sha256,))
+        if cursor.rowcount == 0:
+            db.execute('''
+                INSERT INTO resume_blobs (sha256, content, size, compression, ref_count)
+                VALUES (?, ?, ?, 'zlib', 1)
+            ''', (sha256, zlib.compress(content, 6), len(content)))
+        db.execute('UPDATE resumes SET content = NULL, blob_sha256 = ? WHERE id = ?', (sha256, resume_id))
+    # Give the space held by the duplicated inline copies back to the filesystem
+    return bool(resume_ids)
+
+
+def create_indexes(db):
+    for name, columns in INDEXES.items():
+        db.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {columns}')
+
+
+def create_llm_cache(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)')
+
+
+def create_search_index(db):
+    # External-content FTS5 tables: the text lives only in applications and
+    # resume_text, and triggers keep the indexes in step with every write.
+    db.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS applications_fts USING fts5(
+            company, position, job_description, contact_person,
+            content='applications', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS applications_fts_insert AFTER INSERT ON applications BEGIN
+            INSERT INTO applications_fts (rowid, company, position, job_description, contact_person)
+            VALUES (new.id, new.company, new.position, new.job_description, new.contact_person);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS applications_fts_delete AFTER DELETE ON applications BEGIN
+            INSERT INTO applications_fts (applications_fts, rowid, company, position, job_description, contact_person)
+            VALUES ('delete', old.id, old.company, old.position, old.job_description, old.contact_person);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS applications_fts_update AFTER UPDATE ON applications BEGIN
+            INSERT INTO applications_fts (applications_fts, rowid, company, position, job_description, contact_person)
+            VALUES ('delete', old.id, old.company, old.position, old.job_description, old.contact_person);
+            INSERT INTO applications_fts (rowid, company, position, job_description, contact_person)
+            VALUES (new.id, new.company, new.position, new.job_description, new.contact_person);
+        END
+    ''')
+    db.execute("INSERT INTO applications_fts (applications_fts) VALUES ('rebuild')")
+
+    db.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS resume_text_fts USING fts5(
+            text, content='resume_text', content_rowid='resume_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resume_text_fts_insert AFTER INSERT ON resume_text BEGIN
+            INSERT INTO resume_text_fts (rowid, text) VALUES (new.resume_id, new.text);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resume_text_fts_delete AFTER DELETE ON resume_text BEGIN
+            INSERT INTO resume_text_fts (resume_text_fts, rowid, text) VALUES ('delete', old.resume_id, old.text);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resume_text_fts_update AFTER UPDATE ON resume_text BEGIN
+            INSERT INTO resume_text_fts (resume_text_fts, rowid, text) VALUES ('delete', old.resume_id, old.text);
+            INSERT INTO resume_text_fts (rowid, text) VALUES (new.resume_id, new.text);
+        END
+    ''')
+    db.execute("INSERT INTO resume_text_fts (resume_text_fts) VALUES ('rebuild')")
+
+
+def create_analysis_results(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_results (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            resume_id INTEGER NOT NULL,
+            application_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            completed_at REAL NOT NULL,
+            UNIQUE (resume_id, application_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def create_token_index(db):
+    # Kept out of applications and resume_text so the offset blobs never
+    # slow down scans of those tables; triggers drop an index with its document.
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS token_index (
+            document_type TEXT NOT NULL,
+            document_id INTEGER NOT NULL,
+            token_count INTEGER NOT NULL,
+            offsets BLOB NOT NULL,
+            PRIMARY KEY (document_type, document_id)
+        ) WITHOUT ROWID
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS token_index_application_delete AFTER DELETE ON applications BEGIN
+            DELETE FROM token_index WHERE document_type = 'application' AND document_id = old.id;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS token_index_resume_delete AFTER DELETE ON resume_text BEGIN
+            DELETE FROM token_index WHERE document_type = 'resume' AND document_id = old.resume_id;
+        END
+    ''')
+
+
+def create_chat_history(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            summary TEXT,
+            summarized_through INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY,
+            session_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            token_count INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            FOREIGN KEY (session_id) REFERENCES chat_sessions (id)
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_chat_sessions_user ON chat_sessions (user_id, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id)')
+
+
+def create_settings(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+
+
+def add_analysis_results_cleanup(db):
+    # Resume and application ids are reused after a delete, so results must go
+    # with their documents or a new upload would inherit them. Orphans left by
+    # earlier deletes are removed here.
+    db.execute('CREATE INDEX IF NOT EXISTS idx_analysis_results_application ON analysis_results (application_id)')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS analysis_results_resume_delete AFTER DELETE ON resumes BEGIN
+            DELETE FROM analysis_results WHERE resume_id = old.id;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS analysis_results_application_delete AFTER DELETE ON applications BEGIN
+            DELETE FROM analysis_results WHERE application_id = old.id;
+        END
+    ''')
+    db.execute('DELETE FROM analysis_results WHERE resume_id NOT IN (SELECT id FROM resumes)')
+    db.execute('DELETE FROM analysis_results WHERE application_id NOT IN (SELECT id FROM applications)')
+
+
+def make_application_ids_unique(db):
+    # Without AUTOINCREMENT SQLite hands the highest id out again after that
+    # application is deleted, and caches keyed by id (the match index) would
+    # keep the old row's data. SQLite cannot add AUTOINCREMENT to a table, so
+    # it is rebuilt; ids are kept, so the FTS index and every table keyed on
+    # application_id stay valid. Indexes and triggers are recreated from their
+    # stored SQL, since dropping the table drops them.
+    schema = [row[0] for row in db.fetchall('''
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = 'applications' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''')]
+    db.execute('''
+        CREATE TABLE applications_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            company TEXT NOT NULL,
+            position TEXT NOT NULL,
+            job_description TEXT,
+            contact_person TEXT,
+            date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    db.execute('''
+        INSERT INTO applications_new (id, user_id, company, position, job_description, contact_person, date)
+        SELECT id, user_id, company, position, job_description, contact_person, date FROM applications
+    ''')
+    db.execute('DROP TABLE applications')
+    db.execute('ALTER TABLE applications_new RENAME TO applications')
+    for sql in schema:
+        db.execute(sql)
+
+
+def create_application_owner_index(db):
+    # Search checks the owner of every full-text match; this index answers
+    # that without reading the table's rows, which carry the job descriptions
+    db.execute('CREATE INDEX IF NOT EXISTS idx_applications_id_user ON applications (id, user_id)')
+
+
+# Append only: each migration runs exactly once, in order, and the number of
+# the last one applied is stored in PRAGMA user_version.
+MIGRATIONS = [
+    (1, "Create users, resumes and applications tables", create_base_tables),
+    (2, "Create resume_text table", create_resume_text),
+    (3, "Add size and uploaded_at to resumes", add_resume_metadata),
+    (4, "Move resume content into the deduplicated blob store", create_resume_blobs),
+    (5, "Create indexes for per-user queries", create_indexes),
+    (6, "Create llm_cache table", create_llm_cache),
+    (7, "Create full-text search indexes", create_search_index),
+    (8, "Create analysis_results table", create_analysis_results),
+    (9, "Create token_index table", create_token_index),
+    (10, "Create chat_sessions and chat_messages tables", create_chat_history),
+    (11, "Create settings table", create_settings),
+    (12, "Delete analysis results with their resume or application", add_analysis_results_cleanup),
+    (13, "Stop reusing the ids of deleted applications", make_application_ids_unique),
+    (14, "Index application owners for search", create_application_owner_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db):
+    return db.fetchone('PRAGMA user_version')[0]
+
+
+def migrate(db):
+    with db.lock:
+        return apply_migrations(db)
+
+
+def apply_migrations(db):
+    version = get_schema_version(db)
+    if version >= SCHEMA_VERSION:
+        return False
+
+    vacuum = False
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info(f"Applying database migration {number}: {description}")
+        try:
+            with db.transaction():
+                vacuum = apply(db) or vacuum
+                db.execute(f'PRAGMA user_version = {number}')
+        except Exception:
+            logger.error(f"Database migration {number} failed; rolled back", exc_info=True)
+            raise
+    if vacuum:
+        db.vacuum()
+    return True
@@ -0,0 +1,62 @@
+import io
+import logging
+from modules.token_index import TokenizedText, try_build_token_index
+from modules.tracing import traced, tracer
+
+logger = logging.getLogger(__name__)
+
+
+@traced('parse.pdf')
+def read_pdf(content):
+    from PyPDF2 import PdfReader
+    pdf_reader = PdfReader(io.BytesIO(content))
+    text = "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
+    tracer.count('parse.pdf_bytes', len(content))
+    tracer.count('parse.pdf_pages', len(pdf_reader.pages))
+    return text, len(pdf_reader.pages)
+
+
+@traced('parse.docx')
+def read_docx(content):
+    import docx
+    doc = docx.Document(io.BytesIO(content))
+    text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
+    tracer.count('parse.docx_bytes', len(content))
+    # Word documents carry no reliable page count without rendering them.
+    return text, None
+
+
+def extract_resume(filename, content):
+    if filename.lower().endswith('.pdf'):
+        text, page_count = read_pdf(content)
+    elif filename.lower().endswith('.docx'):
+        text, page_count = read_docx(content)
+    else:
+        # Assuming plain text content is utf-8 encoded
+        text = content.decode('utf-8') if isinstance(content, bytes) else content
+        page_count = None
+    token_count, token_offsets = try_build_token_index(text, filename)
+    return {'text': text, 'page_count': page_count, 'token_count': token_count, 'token_offsets': token_offsets}
+
+
+def get_or_extract_resume_text(db, user_id, filename):
+    # Text is normally extracted in the background at upload time; resumes
+    # stored before that existed are extracted once here and saved.
+    resume_text = db.get_resume_text(user_id, filename)
+    if resume_text and isinstance(resume_text[1], TokenizedText):
+        return resume_text
+    if resume_text:
+        # Extracted before token indexes were stored, or without a tokenizer
+        token_count, token_offsets = try_build_token_index(resume_text[1], filename)
+        if token_offsets is None:
+            return resume_text
+        db.save_resume_text(resume_text[0], resume_text[1], resume_text[2], token_count, token_offsets)
+        return db.get_resume_text(user_id, filename)
+    resume = db.get_resume_by_filename(user_id, filename)
+    if not resume:
+        return None
+    logger.info(f"Extracting text for previously uploaded resume: {filename}")
+    extracted = extract_resume(filename, db.get_resume_content(resume[0]))
+    db.save_resume_text(resume[0], extracted['text'], extracted['page_count'], extracted['token_count'],
+                        extracted['token_offsets'])
+    return db.get_resume_text(user_id, filename)
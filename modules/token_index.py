@@ -0,0 +1,55 @@
+import logging
+from array import array
+from modules.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+
+
+def get_encoding():
+    # tiktoken loads its BPE ranks on first use, so only pay for that once.
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    return _encoding
+
+
+def build_token_index(text):
+    # Token count, plus the character offset at which every token starts,
+    # packed as unsigned 32-bit integers for storage.
+    with tracer.span('tokenize.index'):
+        encoding = get_encoding()
+        tokens = encoding.encode(text)
+        _, offsets = encoding.decode_with_offsets(tokens)
+    tracer.count('tokenize.index_tokens', len(tokens))
+    return len(tokens), array('I', offsets).tobytes()
+
+
+def try_build_token_index(text, description):
+    # The index is only an optimisation: without a tokenizer (tiktoken could
+    # not load its encoding, e.g. offline) documents are stored unindexed
+    # and (None, None) is returned.
+    try:
+        return build_token_index(text)
+    except Exception as e:
+        logger.warning(f"Could not index {description}: {str(e)}")
+        return None, None
+
+
+class TokenizedText(str):
+    # Document text that carries its stored token index, so counting tokens
+    # and truncating to a token budget are a lookup and a slice instead of a
+    # fresh encode of the whole document.
+    def __new__(cls, text, token_count, offsets):
+        tokenized = super().__new__(cls, text)
+        tokenized.token_count = token_count
+        tokenized.offsets = array('I')
+        tokenized.offsets.frombytes(offsets)
+        return tokenized
+
+    def truncate(self, max_tokens):
+        if self.token_count <= max_tokens:
+            return self
+        return str.__str__(self)[:self.offsets[max_tokens]]
@@ -0,0 +1,242 @@
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from functools import wraps
+from config import Config
+
+# Histogram bucket upper bounds in seconds, doubling from 50 µs to about
+# 105 s; one more bucket catches anything slower.
+BUCKETS = tuple(0.00005 * 2 ** i for i in range(22))
+SQL_VERB = re.compile(r'\s*(\w+)')
+SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+)', re.IGNORECASE)
+PROFILE_LINES = 30
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, so at most
+        # one doubling above the true value; never more than the maximum seen
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+            'buckets': list(self.counts),
+        }
+
+
+class Span:
+    # A class rather than a generator-based context manager: entering and
+    # leaving a span is a clock read and one locked histogram update.
+    __slots__ = ('tracer', 'name', 'started', 'profiler')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        if self.tracer.profile_target is not None:
+            self.profiler = self.tracer.claim_profiler(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.tracer.finish_profile(self.name, self.profiler, elapsed)
+        self.tracer.observe(self.name, elapsed, error=exc_type is not None)
+        return False
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    # In-process timings and counters. Spans are named "area.operation"
+    # (db.select.applications, llm.invoke, parse.pdf); each name gets a
+    # histogram with fixed buckets, so memory stays constant however long
+    # the application runs.
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started_at = time.time()
+        self.sql_names = {}
+        # Set by arm_profile(); the next span whose name starts with it is
+        # run under cProfile
+        self.profile_target = None
+        self.last_profile = None
+
+    def span(self, name):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def sql_span(self, sql):
+        name = self.sql_names.get(sql)
+        if name is None:
+            verb, table = SQL_VERB.match(sql), SQL_TABLE.search(sql)
+            name = f"db.{verb.group(1).lower() if verb else 'sql'}"
+            if table:
+                name += f".{table.group(1).lower()}"
+            if len(self.sql_names) < 1000:  # SQL built at runtime must not grow this without bound
+                self.sql_names[sql] = name
+        return self.span(name)
+
+    def observe(self, name, seconds, error=False):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                histogram.errors += 1
+
+    def count(self, name, value=1):
+        if self.enabled and value:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def arm_profile(self, prefix=''):
+        self.profile_target = prefix
+
+    def claim_profiler(self, name):
+        # Only one span is profiled, on whichever thread reaches it first
+        with self.lock:
+            if self.profile_target is None or not name.startswith(self.profile_target):
+                return None
+            self.profile_target = None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is already active on this thread
+            return None
+        return profiler
+
+    def finish_profile(self, name, profiler, elapsed):
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        self.last_profile = {'span': name, 'seconds': elapsed, 'at': time.time(), 'stats': output.getvalue(),
+                             'profiler': profiler}
+
+    def save_profile(self, path):
+        # Binary pstats file for snakeviz, gprof2dot or pstats itself
+        if self.last_profile is None:
+            return False
+        self.last_profile['profiler'].dump_stats(path)
+        return True
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started_at': self.started_at,
+                'taken_at': time.time(),
+                'buckets': list(BUCKETS),
+                'spans': {name: histogram.snapshot() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP captain_span_seconds Time spent in traced operations.',
+            '# TYPE captain_span_seconds histogram',
+        ]
+        for name, span in snapshot['spans'].items():
+            cumulative = 0
+            for bound, count in zip(BUCKETS, span['buckets']):
+                cumulative += count
+                lines.append(f'captain_span_seconds_bucket{{span="{name}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'captain_span_seconds_bucket{{span="{name}",le="+Inf"}} {span["count"]}')
+            lines.append(f'captain_span_seconds_sum{{span="{name}"}} {span["total"]:.6f}')
+            lines.append(f'captain_span_seconds_count{{span="{name}"}} {span["count"]}')
+        lines += [
+            '# HELP captain_span_errors_total Traced operations that raised.',
+            '# TYPE captain_span_errors_total counter',
+        ]
+        lines += [f'captain_span_errors_total{{span="{name}"}} {span["errors"]}'
+                  for name, span in snapshot['spans'].items()]
+        lines += [
+            '# HELP captain_events_total Tokens, bytes and other counted quantities.',
+            '# TYPE captain_events_total counter',
+        ]
+        lines += [f'captain_events_total{{name="{name}"}} {value}' for name, value in snapshot['counters'].items()]
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory=None):
+        # Writes metrics.json and metrics.prom (node_exporter textfile format);
+        # each is written to a temporary file first so readers never see half a file
+        directory = directory or Config.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for filename, content in (('metrics.json', self.to_json()), ('metrics.prom', self.to_prometheus())):
+            path = os.path.join(directory, filename)
+            with open(path + '.tmp', 'w', encoding='utf-8') as file:
+                file.write(content)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        return paths
+
+
+tracer = Tracer(enabled=Config.TRACING_ENABLED)
+
+
+def traced(name):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,17 +1,69 @@
+import logging
+import threading
+import time
 import bcrypt
+from config import Config
 from modules.database import Database
 
+logger = logging.getLogger(__name__)
+
+# bcrypt's own limits are 4..31; below 10 is too weak for stored passwords
+MIN_BCRYPT_COST = 10
+MAX_BCRYPT_COST = 16
+CALIBRATION_COST = 8
+
+
+def hash_cost(hashed_password):
+    # The work factor is part of every bcrypt hash: $2b$<cost>$<salt+hash>
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    return int(hashed_password.split(b'$')[2])
+
+
+def calibrate_bcrypt_cost(target_ms=None):
+    # Each extra round doubles the cost, so one timed hash at a cheap cost is
+    # enough to find the highest cost that stays within the target.
+    target_ms = target_ms or Config.BCRYPT_TARGET_MS
+    started = time.perf_counter()
+    bcrypt.hashpw(b'calibration', bcrypt.gensalt(CALIBRATION_COST))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    cost = CALIBRATION_COST
+    while cost < MAX_BCRYPT_COST and elapsed_ms * 2 <= target_ms:
+        cost += 1
+        elapsed_ms *= 2
+    cost = max(cost, MIN_BCRYPT_COST)
+    logger.info(f"Calibrated bcrypt cost {cost} (about {elapsed_ms:.0f} ms per hash)")
+    return cost
+
 
 class UserManagement:
-    def __init__(self):
-        self.db = Database()
+    # Hashing and checking passwords takes a few hundred milliseconds by design;
+    # call these methods from a worker thread, never the GUI thread.
+    def __init__(self, db=None):
+        self.db = db or Database()
+        self.cost_lock = threading.Lock()
+
+    def bcrypt_cost(self):
+        # Config.BCRYPT_COST wins; otherwise the host is calibrated once and the
+        # result kept in the settings table.
+        if Config.BCRYPT_COST:
+            return Config.BCRYPT_COST
+        with self.cost_lock:
+            cost = self.db.get_setting('bcrypt_cost')
+            if cost is None:
+                cost = calibrate_bcrypt_cost()
+                self.db.set_setting('bcrypt_cost', cost)
+            return int(cost)
+
+    def hash_password(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.bcrypt_cost()))
 
     def register_user(self, username, password, role='user'):
         if self.db.get_user(username):
             return False, "Username already exists"
 
         # Hash the password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = self.hash_password(password)
 
         # Store the hashed password as bytes
         self.db.add_user(username, hashed_password, role)
@@ -21,27 +73,43 @@ class UserManagement:
         user = self.db.get_user(username)
         if user:
             stored_password = user[2]  # Assuming the password is at index 2
+            if isinstance(stored_password, str):
+                stored_password = stored_password.encode('utf-8')
 
             # Ensure the input password is in bytes
             input_password = password.encode('utf-8') if isinstance(password, str) else password
 
             try:
-                if bcrypt.checkpw(input_password, stored_password):
-                    return True, user
+                password_matches = bcrypt.checkpw(input_password, stored_password)
             except Exception as e:
-                print(f"Error during password check: {str(e)}")
+                logger.error(f"Error during password check: {str(e)}")
+                password_matches = False
+            if password_matches:
+                # An upgrade that fails is retried at the next login; it never fails this one
+                try:
+                    self.rehash_if_needed(user, password, stored_password)
+                except Exception as e:
+                    logger.error(f"Error upgrading the password hash of user {user[0]}: {str(e)}")
+                return True, user
 
         return False, None
 
+    def rehash_if_needed(self, user, password, stored_password):
+        # The plain password is only available at login, so that is when a hash
+        # made under an older cost policy is upgraded.
+        cost = self.bcrypt_cost()
+        if hash_cost(stored_password) != cost:
+            logger.info(f"Rehashing password for user {user[0]} with bcrypt cost {cost}")
+            self.db.update_user_password(user[0], self.hash_password(password))
+
     def get_user_role(self, user_id):
         user = self.db.get_user_by_id(user_id)
         return user[3] if user else None
 
     def change_password(self, user_id, new_password):
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-        self.db.update_user_password(user_id, hashed_password)
+        self.db.update_user_password(user_id, self.hash_password(new_password))
         return True, "Password changed successfully"
 
     def delete_user(self, user_id):
         self.db.delete_user(user_id)
-        return True, "User deleted successfully"
\ No newline at end of file
+        return True, "User deleted successfully"
@@ -0,0 +1,123 @@
+import logging
+import queue
+import re
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_END.split(text) if sentence.strip()]
+
+
+class SpeechStream:
+    # Speaks a reply while it is still streaming in: each sentence is queued
+    # as soon as its end has arrived.
+    def __init__(self, speech_queue, generation):
+        self.speech_queue = speech_queue
+        self.generation = generation
+        self.buffer = ""
+
+    def add_text(self, text):
+        self.buffer += text
+        *sentences, self.buffer = SENTENCE_END.split(self.buffer)
+        for sentence in sentences:
+            self.speech_queue.put(self.generation, sentence)
+
+    def finish(self):
+        self.speech_queue.put(self.generation, self.buffer)
+        self.buffer = ""
+
+
+class SpeechQueue(QObject):
+    # Text-to-speech on a dedicated thread, one sentence at a time, so the GUI
+    # never waits on the speech engine and speech can be cut short between
+    # sentences. pyttsx3 engines must be driven from the thread that created
+    # them, so the engine is created there, on first use, and only that thread
+    # ever calls it, stop() included.
+    error = pyqtSignal(str)
+
+    def __init__(self, engine_factory=None, parent=None):
+        super().__init__(parent)
+        self.engine_factory = engine_factory
+        self.engine = None
+        self.queue = queue.Queue()
+        self.generation = 0  # bumped by interrupt(); older sentences are dropped
+        self.speaking = None  # generation of the sentence the worker is speaking
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="tts-worker", daemon=True)
+                self.thread.start()
+
+    def put(self, generation, sentence):
+        if sentence.strip() and generation == self.generation:
+            self.start()
+            self.queue.put((generation, sentence.strip()))
+
+    def speak(self, text):
+        for sentence in split_sentences(text):
+            self.put(self.generation, sentence)
+
+    def stream(self):
+        return SpeechStream(self, self.generation)
+
+    def interrupt(self):
+        # Drops everything queued; the worker sees the new generation at the
+        # next word of the current sentence and stops the engine itself
+        self.generation += 1
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def shutdown(self):
+        self.interrupt()
+        if self.thread is not None:
+            self.queue.put((None, None))
+
+    def get_engine(self):
+        if self.engine is None:
+            if self.engine_factory is None:
+                import pyttsx3
+                self.engine_factory = pyttsx3.init
+            self.engine = self.engine_factory()
+            try:
+                self.engine.connect('started-word', self.on_word)
+            except Exception as e:
+                logger.debug(f"Text-to-speech cannot be stopped mid-sentence: {str(e)}")
+        return self.engine
+
+    def on_word(self, name, location, length):
+        # Called on the worker thread, inside runAndWait()
+        if self.speaking is not None and self.speaking != self.generation:
+            self.speaking = None
+            try:
+                self.engine.stop()
+            except Exception as e:
+                logger.debug(f"Could not stop text-to-speech: {str(e)}")
+
+    def run(self):
+        while True:
+            generation, sentence = self.queue.get()
+            if sentence is None:
+                break
+            if generation != self.generation:
+                continue
+            try:
+                engine = self.get_engine()
+                self.speaking = generation
+                engine.say(sentence)
+                engine.runAndWait()
+            except Exception as e:
+                logger.error(f"Error in text-to-speech: {str(e)}")
+                self.error.emit(str(e))
+            finally:
+                self.speaking = None
@@ -1,54 +1,80 @@
 import os
-import io
-import docx
 from PyQt5.QtWidgets import (QDialog, QFormLayout, QLineEdit, QPushButton, QMessageBox, QVBoxLayout, QHBoxLayout,
-                             QListWidget, QTextEdit, QLabel, QDateEdit, QFileDialog, QWidget, QMainWindow, QTabWidget)
-from PyQt5.QtCore import Qt, QDate, pyqtSignal
-from PyPDF2 import PdfReader
+                             QListWidget, QTextEdit, QLabel, QDateEdit, QFileDialog, QWidget, QMainWindow, QTabWidget,
+                             QTableView, QAbstractItemView)
+from PyQt5.QtCore import Qt, QDate, QTimer, pyqtSignal
+from modules.resume_parser import extract_resume, get_or_extract_resume_text
+from modules.bulk_io import import_applications, export_applications
+from modules.token_index import TokenizedText
+from application_model import ApplicationTableModel
 import logging
 
-class LoginDialog(QDialog):
-    def __init__(self, parent=None):
+logger = logging.getLogger(__name__)
+
+def debounce_timer(parent, callback, interval=150):
+    # Live search runs once typing pauses rather than on every keystroke
+    timer = QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(interval)
+    timer.timeout.connect(callback)
+    return timer
+
+class CredentialsDialog(QDialog):
+    # Stays open while the credentials are checked on a worker thread: the
+    # owner handles credentials_submitted and calls accept() or show_error().
+    credentials_submitted = pyqtSignal(str, str)
+
+    def __init__(self, title, submit_text, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Login")
-        self.setWindowModality(Qt.ApplicationModal)
-        self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
+        self.setWindowTitle(title)
+        self.setModal(True)
 
-        layout = QFormLayout(self)
+        self.form_layout = QFormLayout(self)
         self.username_input = QLineEdit(self)
         self.password_input = QLineEdit(self)
         self.password_input.setEchoMode(QLineEdit.Password)
-        layout.addRow("Username:", self.username_input)
-        layout.addRow("Password:", self.password_input)
+        self.form_layout.addRow("Username:", self.username_input)
+        self.form_layout.addRow("Password:", self.password_input)
 
-        login_button = QPushButton("Login", self)
-        login_button.clicked.connect(self.accept)
-        layout.addRow(login_button)
+        self.status_label = QLabel(self)
+        self.form_layout.addRow(self.status_label)
 
-        register_button = QPushButton("Register", self)
-        register_button.clicked.connect(self.register)
-        layout.addRow(register_button)
+        self.submit_button = QPushButton(submit_text, self)
+        self.submit_button.clicked.connect(self.submit)
+        self.password_input.returnPressed.connect(self.submit)
+        self.form_layout.addRow(self.submit_button)
 
-    def register(self):
-        self.parent().show_registration_dialog()
-        self.close()
+    def submit(self):
+        if not self.submit_button.isEnabled():
+            return
+        self.set_busy("Please wait...")
+        self.credentials_submitted.emit(self.username_input.text(), self.password_input.text())
 
-class RegistrationDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Register")
-        self.setModal(True)
+    def set_busy(self, message):
+        self.status_label.setText(message)
+        self.submit_button.setEnabled(False)
 
-        layout = QFormLayout(self)
-        self.username_input = QLineEdit(self)
-        self.password_input = QLineEdit(self)
-        self.password_input.setEchoMode(QLineEdit.Password)
-        layout.addRow("Username:", self.username_input)
-        layout.addRow("Password:", self.password_input)
+    def show_error(self, message):
+        self.status_label.setText(message)
+        self.submit_button.setEnabled(True)
+        self.password_input.clear()
+        self.password_input.setFocus()
+
+class LoginDialog(CredentialsDialog):
+    REGISTER = 2  # exec_() result when the user asks to register instead
+
+    def __init__(self, parent=None):
+        super().__init__("Login", "Login", parent)
+        self.setWindowModality(Qt.ApplicationModal)
+        self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
 
         register_button = QPushButton("Register", self)
-        register_button.clicked.connect(self.accept)
-        layout.addRow(register_button)
+        register_button.clicked.connect(lambda: self.done(self.REGISTER))
+        self.form_layout.addRow(register_button)
+
+class RegistrationDialog(CredentialsDialog):
+    def __init__(self, parent=None):
+        super().__init__("Register", "Register", parent)
 
 class ResumeViewWindow(QMainWindow):
     def __init__(self, text, filename, file_type):
@@ -60,19 +86,23 @@ class ResumeViewWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
 
-        text_edit = QTextEdit()
-        text_edit.setReadOnly(True)
-        text_edit.setPlainText(text)
-        layout.addWidget(text_edit)
+        self.text_edit = QTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setPlainText(text)
+        layout.addWidget(self.text_edit)
+
+    def set_text(self, text):
+        self.text_edit.setPlainText(text)
 
 class ResumeManagementTab(QWidget):
     resume_selected = pyqtSignal(str, str)
     cover_letter_requested = pyqtSignal(str, str)
 
-    def __init__(self, user_id, database, parent=None):
+    def __init__(self, user_id, database, executor, parent=None):
         super().__init__(parent)
         self.user_id = user_id
         self.db = database
+        self.executor = executor
         self.init_ui()
 
     def init_ui(self):
@@ -85,6 +115,12 @@ class ResumeManagementTab(QWidget):
         upload_btn.clicked.connect(self.upload_resume)
         left_layout.addWidget(upload_btn)
 
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search resumes...")
+        self.search_timer = debounce_timer(self, self.load_resumes)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        left_layout.addWidget(self.search_input)
+
         self.resume_list = QListWidget()
         self.resume_list.itemClicked.connect(self.view_resume)
         left_layout.addWidget(self.resume_list)
@@ -120,42 +156,61 @@ class ResumeManagementTab(QWidget):
             file_name = os.path.basename(file_path)
             with open(file_path, 'rb') as file:
                 content = file.read()
-            self.db.add_resume(self.user_id, file_name, content)
+            resume_id = self.db.add_resume(self.user_id, file_name, content)
             self.load_resumes()
+            # Parse the document once, off the GUI thread, and keep the text so
+            # viewers and the chat never have to touch the blob again.
+            self.executor.submit(lambda job: extract_resume(file_name, content),
+                                 description=f"Extracting text from {file_name}", trace_name="job.extract_resume",
+                                 on_result=lambda extracted: self.save_extracted_text(resume_id, extracted),
+                                 on_error=lambda message: logger.error(
+                                     f"Error extracting text from {file_name}: {message}"))
+
+    def save_extracted_text(self, resume_id, extracted):
+        self.db.save_resume_text(resume_id, extracted['text'], extracted['page_count'], extracted['token_count'],
+                                 extracted['token_offsets'])
 
     def load_resumes(self):
         self.resume_list.clear()
-        resumes = self.db.get_resumes(self.user_id)
-        for resume in resumes:
-            self.resume_list.addItem(resume[2])  # Assuming filename is at index 2
+        search_text = self.search_input.text().strip()
+        if search_text:
+            resumes = self.db.search_resumes(self.user_id, search_text)
+        else:
+            resumes = self.db.get_resumes(self.user_id)
+        for resume_id, filename, size, uploaded_at, token_count in resumes:
+            self.resume_list.addItem(filename)
+            item = self.resume_list.item(self.resume_list.count() - 1)
+            tokens = f"{token_count:,} tokens" if token_count is not None else "text not extracted yet"
+            item.setToolTip(f"{(size or 0) / 1024:.0f} KB, {tokens}, uploaded {uploaded_at or 'unknown'}")
 
     def view_resume(self, item):
-        try:
-            resume = self.db.get_resume_by_filename(self.user_id, item.text())
-            if resume:
-                content = resume[3]  # Assuming content is at index 3
-                filename = resume[2]  # Assuming filename is at index 2
-                file_type = 'pdf' if filename.lower().endswith('.pdf') else 'docx' if filename.lower().endswith('.docx') else 'txt'
-
-                # Decode the content based on the file type
-                if file_type == 'pdf':
-                    content = self.read_pdf(content)
-                elif file_type == 'docx':
-                    content = self.read_docx(content)
-                else:
-                    content = content.decode('utf-8')  # Assuming plain text content is utf-8 encoded
-
-                self.resume_selected.emit(str(self.user_id), filename)
-                resume_view_window = ResumeViewWindow(content, filename, file_type)
-                resume_view_window.show()
-
-                # Keep a reference to the window to prevent it from being garbage collected
-                self.resume_view_window = resume_view_window
+        filename = item.text()
+        user_id = self.user_id
+        extension = filename.lower().rsplit('.', 1)[-1]
+        file_type = extension if extension in ('pdf', 'docx') else 'txt'
+        # The window opens at once; the text is read, or for a resume whose
+        # extraction never finished, parsed, off the GUI thread
+        resume_view_window = ResumeViewWindow(f"Loading {filename}...", filename, file_type)
+        resume_view_window.show()
+        # Keep a reference to the window to prevent it from being garbage collected
+        self.resume_view_window = resume_view_window
+
+        def on_result(resume_text):
+            if resume_text:
+                resume_view_window.set_text(resume_text[1])
+                self.resume_selected.emit(str(user_id), filename)
             else:
+                resume_view_window.close()
                 QMessageBox.warning(self, "Resume Not Found", "The selected resume could not be found.")
-        except Exception as e:
-            logging.error(f"Error viewing resume: {str(e)}")
-            QMessageBox.critical(self, "Error", f"An error occurred while viewing the resume: {str(e)}")
+
+        def on_error(message):
+            logger.error(f"Error viewing resume: {message}")
+            resume_view_window.close()
+            QMessageBox.critical(self, "Error", f"An error occurred while viewing the resume: {message}")
+
+        self.executor.submit(lambda job: get_or_extract_resume_text(self.db, user_id, filename),
+                             description=f"Loading {filename}", trace_name="job.load_resume",
+                             on_result=on_result, on_error=on_error, interactive=True)
 
     def delete_resume(self):
         current_item = self.resume_list.currentItem()
@@ -173,14 +228,6 @@ class ResumeManagementTab(QWidget):
             self.cover_letter_requested.emit(str(self.user_id), current_item.text())
             QMessageBox.information(self, "Cover Letter", "Cover letter creation in progress.")
 
-    def read_pdf(self, content):
-        pdf_reader = PdfReader(io.BytesIO(content))
-        return "\n".join(page.extract_text() for page in pdf_reader.pages)
-
-    def read_docx(self, content):
-        doc = docx.Document(io.BytesIO(content))
-        return "\n".join(paragraph.text for paragraph in doc.paragraphs)
-
 class AddApplicationDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -206,12 +253,13 @@ class AddApplicationDialog(QDialog):
         layout.addRow(add_button)
 
 class ApplicationTrackingTab(QWidget):
-    application_selected = pyqtSignal(str, str, str)  # Signal for application selection (user_id, company, position)
+    application_selected = pyqtSignal(str, int)  # Signal for application selection (user_id, application_id)
 
-    def __init__(self, user_id, database):
+    def __init__(self, user_id, database, executor):
         super().__init__()
         self.user_id = user_id
         self.db = database
+        self.executor = executor
         self.init_ui()
 
     def init_ui(self):
@@ -221,9 +269,34 @@ class ApplicationTrackingTab(QWidget):
         add_btn.clicked.connect(self.add_application)
         layout.addWidget(add_btn)
 
-        self.application_list = QListWidget()
-        self.application_list.itemDoubleClicked.connect(self.view_application)
-        layout.addWidget(self.application_list)
+        bulk_layout = QHBoxLayout()
+        import_btn = QPushButton("Import Applications...")
+        import_btn.clicked.connect(self.import_applications)
+        bulk_layout.addWidget(import_btn)
+        export_btn = QPushButton("Export Applications...")
+        export_btn.clicked.connect(self.export_applications)
+        bulk_layout.addWidget(export_btn)
+        layout.addLayout(bulk_layout)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search company, position, description or contact...")
+        self.search_timer = debounce_timer(self, lambda: self.application_model.set_search(self.search_input.text()))
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        layout.addWidget(self.search_input)
+
+        self.application_model = ApplicationTableModel(self.db, self.user_id, self)
+        self.application_view = QTableView()
+        self.application_view.setModel(self.application_model)
+        self.application_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.application_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.application_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.application_view.horizontalHeader().setStretchLastSection(True)
+        self.application_view.verticalHeader().hide()
+        self.application_view.doubleClicked.connect(self.view_application)
+        layout.addWidget(self.application_view)
 
         delete_btn = QPushButton("Delete Selected Application")
         delete_btn.clicked.connect(self.delete_application)
@@ -242,52 +315,101 @@ class ApplicationTrackingTab(QWidget):
                 contact_person = dialog.contact_person_input.text()
                 date = dialog.date_input.date().toString("yyyy-MM-dd")
 
-                self.db.add_application(self.user_id, company, position, job_description, contact_person, date)
-                self.load_applications()
+                application_id = self.db.add_application(self.user_id, company, position, job_description,
+                                                         contact_person, date)
+                self.application_model.insert_application(application_id)
+                self.index_applications()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"An error occurred while adding the application: {str(e)}")
 
+    def import_applications(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Import Applications", "",
+                                                   "CSV Files (*.csv);;JSON Lines (*.jsonl *.ndjson)")
+        if not file_path:
+            return
+
+        def run(job):
+            def progress(report):
+                # Batches already written stay imported if the job is cancelled
+                job.check_cancelled()
+                job.report_progress(f"Imported {report.inserted} applications...")
+            return import_applications(self.db, self.user_id, file_path, progress=progress)
+
+        def on_result(report):
+            self.status_label.setText(report.summary())
+            self.load_applications()
+            if report.inserted:
+                self.index_applications()
+            if report.errors:
+                details = "\n".join(f"Line {line}: {message}" for line, message in report.errors[:20])
+                QMessageBox.warning(self, "Import Finished", f"{report.summary()}\n\n{details}")
+
+        self.status_label.setText("Importing applications...")
+        self.executor.submit(run, description="Importing applications", on_result=on_result,
+                             on_progress=self.status_label.setText,
+                             on_error=lambda message: QMessageBox.critical(
+                                 self, "Error", f"An error occurred while importing applications: {message}"))
+
+    def index_applications(self):
+        # Token indexes are built once per application, off the GUI thread
+        self.executor.submit(lambda job: self.db.index_applications(self.user_id),
+                             description="Indexing applications",
+                             on_error=lambda message: logger.warning(f"Could not index applications: {message}"))
+
+    def export_applications(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Applications", "applications.csv",
+                                                   "CSV Files (*.csv);;JSON Lines (*.jsonl)")
+        if not file_path:
+            return
+        self.status_label.setText("Exporting applications...")
+        self.executor.submit(lambda job: export_applications(self.db, self.user_id, file_path),
+                             description="Exporting applications",
+                             on_result=lambda count: self.status_label.setText(
+                                 f"Exported {count} applications to {os.path.basename(file_path)}"),
+                             on_error=lambda message: QMessageBox.critical(
+                                 self, "Error", f"An error occurred while exporting applications: {message}"))
+
     def load_applications(self):
-        self.application_list.clear()
-        applications = self.db.get_applications(self.user_id)
-        for app in applications:
-            self.application_list.addItem(f"{app[2]} - {app[3]} ({app[6]})")  # Company - Position (Date)
+        self.application_model.reload()
 
-    def view_application(self, item):
+    def view_application(self, index):
         try:
-            company, rest = item.text().split(" - ")
-            position, date = rest.split(" (")
-            date = date[:-1]  # Remove the closing parenthesis
-            application = self.db.get_application_by_company_position_date(self.user_id, company, position, date)
+            application_id = self.application_model.application_id(index.row())
+            application = self.db.get_application(self.user_id, application_id)
             if application:
+                # Not indexed here, on the GUI thread; a plain str until indexed
+                job_description = self.db.get_job_description(self.user_id, application_id, build_index=False)
+                if isinstance(job_description, TokenizedText):
+                    length = f"{job_description.token_count:,} tokens"
+                else:
+                    length = f"{len(job_description):,} characters"
                 QMessageBox.information(self, "Application Details",
                                         f"Company: {application[2]}\n"
                                         f"Position: {application[3]}\n"
                                         f"Job Description: {application[4]}\n"
                                         f"Contact Person: {application[5]}\n"
-                                        f"Date: {application[6]}")
+                                        f"Date: {application[6]}\n"
+                                        f"Length: {length}")
 
                 # Emit the application_selected signal when the application is viewed
-                self.application_selected.emit(str(self.user_id), company, position)
+                self.application_selected.emit(str(self.user_id), application_id)
             else:
                 QMessageBox.warning(self, "Application Not Found", "The selected application could not be found.")
         except Exception as e:
-            logging.error(f"Error viewing application: {str(e)}")
+            logger.error(f"Error viewing application: {str(e)}")
             QMessageBox.critical(self, "Error", f"An error occurred while viewing the application: {str(e)}")
 
     def delete_application(self):
-        current_item = self.application_list.currentItem()
-        if current_item:
+        index = self.application_view.currentIndex()
+        if index.isValid():
             try:
-                company, rest = current_item.text().split(" - ")
-                position, date = rest.split(" (")
-                date = date[:-1]  # Remove the closing parenthesis
+                application_id = self.application_model.application_id(index.row())
                 reply = QMessageBox.question(self, "Delete Application",
                                              f"Are you sure you want to delete this application?",
                                              QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
                 if reply == QMessageBox.Yes:
-                    self.db.delete_application(self.user_id, company, position, date)
-                    self.load_applications()
+                    self.db.delete_application_by_id(self.user_id, application_id)
+                    self.application_model.remove_application(application_id)
             except Exception as e:
-                logging.error(f"Error deleting application: {str(e)}")
+                logger.error(f"Error deleting application: {str(e)}")
                 QMessageBox.critical(self, "Error", f"An error occurred while deleting the application: {str(e)}")
@@ -0,0 +1,202 @@
+import collections
+import logging
+import queue
+import threading
+import time
+import wave
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WIDTH = 2  # 16-bit mono PCM throughout
+
+
+class MicrophoneSource:
+    def __init__(self, sample_rate=16000, chunk_size=480):
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+
+    def frames(self, stop_event):
+        import speech_recognition as sr
+        with sr.Microphone(sample_rate=self.sample_rate, chunk_size=self.chunk_size) as source:
+            while not stop_event.is_set():
+                yield source.stream.read(self.chunk_size)
+
+
+class WavFileSource:
+    # Replays a 16-bit mono WAV file as if it were a microphone; realtime=False
+    # feeds it as fast as it can be read, for tests and benchmarks.
+    def __init__(self, path, frame_ms=30, realtime=False):
+        self.path = path
+        self.frame_ms = frame_ms
+        self.realtime = realtime
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != SAMPLE_WIDTH or wav.getnchannels() != 1:
+                raise ValueError(f"{path} is not 16-bit mono PCM")
+            self.sample_rate = wav.getframerate()
+
+    def frames(self, stop_event):
+        frame_count = self.sample_rate * self.frame_ms // 1000
+        with wave.open(self.path, 'rb') as wav:
+            while not stop_event.is_set():
+                frame = wav.readframes(frame_count)
+                if not frame:
+                    break
+                if self.realtime:
+                    time.sleep(self.frame_ms / 1000)
+                yield frame
+
+
+class EnergyVAD:
+    # Splits a stream of PCM frames into utterances. A frame counts as speech
+    # when its RMS energy is well above a running estimate of the background
+    # noise; an utterance starts after min_speech_ms of speech (keeping a short
+    # pre-roll so the first syllable is not clipped) and ends after
+    # end_silence_ms of silence or at max_utterance_s.
+    def __init__(self, sample_rate, min_energy=300, noise_ratio=3.0, min_speech_ms=120, end_silence_ms=700,
+                 pre_roll_ms=300, max_utterance_s=15):
+        self.sample_rate = sample_rate
+        self.min_energy = min_energy
+        self.noise_ratio = noise_ratio
+        self.min_speech_ms = min_speech_ms
+        self.end_silence_ms = end_silence_ms
+        self.max_utterance_ms = max_utterance_s * 1000
+        self.noise_floor = min_energy / noise_ratio
+        self.pre_roll = collections.deque()
+        self.pre_roll_ms = pre_roll_ms
+        self.reset()
+
+    def reset(self):
+        self.frames = []
+        self.speech_ms = 0
+        self.silence_ms = 0
+        self.utterance_ms = 0
+        self.in_utterance = False
+
+    def is_speech(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        energy = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        speech = energy > max(self.min_energy, self.noise_floor * self.noise_ratio)
+        if not speech:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+        return speech
+
+    def add_frame(self, frame):
+        # Returns the utterance's PCM bytes when one has just ended, else None
+        duration_ms = len(frame) / SAMPLE_WIDTH * 1000 / self.sample_rate
+        speech = self.is_speech(frame)
+        if not self.in_utterance:
+            self.pre_roll.append((frame, duration_ms))
+            while sum(ms for _, ms in self.pre_roll) > self.pre_roll_ms + self.min_speech_ms:
+                self.pre_roll.popleft()
+            self.speech_ms = self.speech_ms + duration_ms if speech else 0
+            if self.speech_ms >= self.min_speech_ms:
+                self.in_utterance = True
+                self.frames = [buffered for buffered, _ in self.pre_roll]
+                self.utterance_ms = sum(ms for _, ms in self.pre_roll)
+                self.pre_roll.clear()
+            return None
+        self.frames.append(frame)
+        self.utterance_ms += duration_ms
+        self.silence_ms = 0 if speech else self.silence_ms + duration_ms
+        if self.silence_ms >= self.end_silence_ms or self.utterance_ms >= self.max_utterance_ms:
+            return self.flush()
+        return None
+
+    def flush(self):
+        audio = b"".join(self.frames) if self.in_utterance else None
+        self.reset()
+        return audio
+
+
+class SpeechRecognitionBackend:
+    # Any recognize_* method of speech_recognition.Recognizer: "sphinx",
+    # "vosk" or "whisper" run offline, "google" needs the network.
+    def __init__(self, engine=None):
+        import speech_recognition as sr
+        self.sr = sr
+        self.engine = engine or Config.VOICE_BACKEND
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, audio, sample_rate):
+        # Returns the recognised text, or None when nothing intelligible was said
+        audio_data = self.sr.AudioData(audio, sample_rate, SAMPLE_WIDTH)
+        try:
+            return getattr(self.recognizer, f"recognize_{self.engine}")(audio_data)
+        except self.sr.UnknownValueError:
+            return None
+
+
+class VoiceInput(QObject):
+    # Continuous listening: one thread reads the audio source and segments it
+    # with the VAD, another runs the (possibly slow) recogniser, so listening
+    # never pauses for recognition and the GUI only ever sees signals.
+    text_recognized = pyqtSignal(str)
+    listening_changed = pyqtSignal(bool)
+    error = pyqtSignal(str)
+
+    def __init__(self, source_factory=None, backend_factory=None, parent=None):
+        super().__init__(parent)
+        self.source_factory = source_factory or MicrophoneSource
+        self.backend_factory = backend_factory or SpeechRecognitionBackend
+        self.stop_event = threading.Event()
+        self.utterances = queue.Queue()
+        self.threads = []
+
+    def is_listening(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def start(self):
+        if self.is_listening():
+            return
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self.listen, name="voice-listener", daemon=True),
+            threading.Thread(target=self.recognize, name="voice-recognizer", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        self.listening_changed.emit(True)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def wait(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def listen(self):
+        try:
+            source = self.source_factory()
+            vad = EnergyVAD(source.sample_rate)
+            for frame in source.frames(self.stop_event):
+                audio = vad.add_frame(frame)
+                if audio:
+                    self.utterances.put((audio, source.sample_rate))
+            audio = vad.flush()
+            if audio:
+                self.utterances.put((audio, source.sample_rate))
+        except Exception as e:
+            logger.error(f"Error capturing audio: {str(e)}", exc_info=True)
+            self.error.emit(f"Could not capture audio: {str(e)}")
+        finally:
+            self.utterances.put(None)
+            self.listening_changed.emit(False)
+
+    def recognize(self):
+        backend = None
+        while True:
+            item = self.utterances.get()
+            if item is None:
+                break
+            try:
+                backend = backend or self.backend_factory()
+                text = backend.recognize(*item)
+            except Exception as e:
+                logger.error(f"Error in speech recognition: {str(e)}")
+                self.error.emit(f"An error occurred while recognizing speech: {str(e)}")
+                continue
+            if text and text.strip():
+                self.text_recognized.emit(text.strip())